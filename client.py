@@ -16,8 +16,12 @@ CLIENT_SECRET = 'FmtHkmLvCFiB_sq1QUMmiS_yEX3Ab-SvzEmR36g9'
 REDIRECT_URI = 'http://127.0.0.1:8000/oauth/callback'
 
 
-def store_data(key, value, data_type='string'):
-    """存储数据到认证服务器"""
+# 会话类数据（最近登录、最近活动）的保存时间，过期后由认证服务器自动删除
+SESSION_DATA_TTL = 7 * 24 * 3600
+
+
+def store_data(key, value, data_type='string', ttl=None):
+    """存储数据到认证服务器，ttl为保存秒数（默认永久保存）"""
     access_token = session.get('access_token')
     if not access_token:
         return None
@@ -32,6 +36,31 @@ def store_data(key, value, data_type='string'):
         'value': value,
         'type': data_type
     }
+    if ttl:
+        data['ttl'] = ttl
+
+    response = requests.post(f"{OAUTH_SERVER}/oauth/client_data",
+                             json=data, headers=headers)
+    return response.json() if response.status_code == 200 else None
+
+
+def store_data_batch(items):
+    """批量存储数据到认证服务器，items为 (key, value, type[, ttl]) 列表，一次请求写入"""
+    access_token = session.get('access_token')
+    if not access_token:
+        return None
+
+    headers = {
+        'Authorization': f'Bearer {access_token}',
+        'Content-Type': 'application/json'
+    }
+
+    data = {'items': []}
+    for key, value, data_type, *ttl in items:
+        item = {'key': key, 'value': value, 'type': data_type}
+        if ttl:
+            item['ttl'] = ttl[0]
+        data['items'].append(item)
 
     response = requests.post(f"{OAUTH_SERVER}/oauth/client_data",
                              json=data, headers=headers)
@@ -67,6 +96,24 @@ def delete_data(key):
     return response.json() if response.status_code == 200 else None
 
 
+def delete_data_bulk(keys=None, prefix=None):
+    """批量删除数据: 给出键名列表或前缀，都不给时删除全部数据；一次请求完成"""
+    access_token = session.get('access_token')
+    if not access_token:
+        return None
+
+    headers = {'Authorization': f'Bearer {access_token}'}
+
+    url = f"{OAUTH_SERVER}/oauth/client_data"
+    if keys is not None:
+        response = requests.delete(url, json={'keys': keys}, headers=headers)
+    elif prefix:
+        response = requests.delete(url, params={'prefix': prefix}, headers=headers)
+    else:
+        response = requests.delete(url, params={'all': 'true'}, headers=headers)
+    return response.json() if response.status_code == 200 else None
+
+
 @app.route('/')
 def index():
     return '''
@@ -175,9 +222,11 @@ def profile():
         return redirect('/login')
 
     # 存储一些示例数据
-    store_data('last_login', datetime.now().isoformat())
-    store_data('theme_preference', 'dark', 'string')
-    store_data('user_settings', {'notifications': True, 'language': 'zh-CN'}, 'object')
+    store_data_batch([
+        ('last_login', datetime.now().isoformat(), 'string', SESSION_DATA_TTL),
+        ('theme_preference', 'dark', 'string'),
+        ('user_settings', {'notifications': True, 'language': 'zh-CN'}, 'object'),
+    ])
 
     # 获取存储的数据
     user_data = get_data()
@@ -241,14 +290,16 @@ def store_sample_data():
         return jsonify({'error': '未登录'}), 401
 
     # 存储各种类型的数据
-    store_data('visit_count', 1, 'number')
-    store_data('favorite_color', 'blue', 'string')
-    store_data('preferences', {
-        'email_notifications': True,
-        'theme': 'dark',
-        'language': 'zh-CN'
-    }, 'object')
-    store_data('last_activity', datetime.now().isoformat(), 'datetime')
+    store_data_batch([
+        ('visit_count', 1, 'number'),
+        ('favorite_color', 'blue', 'string'),
+        ('preferences', {
+            'email_notifications': True,
+            'theme': 'dark',
+            'language': 'zh-CN'
+        }, 'object'),
+        ('last_activity', datetime.now().isoformat(), 'datetime', SESSION_DATA_TTL),
+    ])
 
     return jsonify({'status': 'success', 'message': '示例数据存储成功'})
 
@@ -260,13 +311,11 @@ def clear_data():
     if not user:
         return jsonify({'error': '未登录'}), 401
 
-    # 获取所有数据键
-    all_data = get_data()
-    if all_data and isinstance(all_data, list):
-        for item in all_data:
-            delete_data(item['key'])
+    # 一次请求删除所有数据
+    result = delete_data_bulk()
+    deleted_count = result['deleted_count'] if result else 0
 
-    return jsonify({'status': 'success', 'message': '数据已清除'})
+    return jsonify({'status': 'success', 'message': f'数据已清除（{deleted_count} 条）'})
 
 
 if __name__ == '__main__':
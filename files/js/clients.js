@@ -417,57 +417,83 @@ if (document.getElementById('editClientForm')) {
 }
 
 // Client data management
+const CLIENT_DATA_PAGE_SIZE = 50;
+
+function renderClientDataRow(clientId, item) {
+    let valueDisplay = item.value;
+    if (typeof item.value === 'object') {
+        valueDisplay = JSON.stringify(item.value, null, 2);
+    }
+
+    // Truncate long values for display
+    let displayValue = valueDisplay;
+    if (displayValue && displayValue.length > 100) {
+        displayValue = displayValue.substring(0, 100) + '...';
+    }
+
+    return `
+        <tr>
+            <td><strong>${escapeHtml(item.key)}</strong></td>
+            <td>
+                <div title="${escapeHtml(valueDisplay)}">
+                    <pre style="margin:0;max-width:200px;overflow:auto;background:rgba(0,0,0,0.3);padding:8px;border-radius:4px;cursor:help;">${escapeHtml(displayValue)}</pre>
+                </div>
+            </td>
+            <td>${escapeHtml(item.type)}</td>
+            <td>${new Date(item.updated_at).toLocaleString()}</td>
+            <td>
+                <button class="btn btn-danger" style="padding:6px 12px;font-size:0.8rem;"
+                        onclick="deleteDataItem('${clientId}', '${escapeHtml(item.key)}')">
+                    <i class="fas fa-trash"></i> 删除
+                </button>
+            </td>
+        </tr>
+    `;
+}
+
+function fetchClientDataPage(clientId, cursor) {
+    let url = `/api/client_data/${clientId}?limit=${CLIENT_DATA_PAGE_SIZE}`;
+    if (cursor) {
+        url += `&cursor=${encodeURIComponent(cursor)}`;
+    }
+
+    return fetch(url).then(response => {
+        if (!response.ok) {
+            throw new Error('获取数据失败');
+        }
+        return response.json();
+    });
+}
+
+function renderLoadMoreButton(clientId, nextCursor) {
+    if (!nextCursor) {
+        return '';
+    }
+    return `
+        <div class="text-center p-3" id="data-more-${clientId}">
+            <button class="btn btn-secondary" onclick="loadMoreClientData('${clientId}', '${nextCursor}')">
+                <i class="fas fa-chevron-down"></i> 加载更多
+            </button>
+        </div>
+    `;
+}
+
 function loadClientData(clientId) {
     const contentDiv = document.getElementById(`data-content-${clientId}`);
     contentDiv.innerHTML = '<div class="text-center p-3"><i class="fas fa-spinner fa-spin"></i><p>加载中...</p></div>';
 
-    fetch(`/api/client_data/${clientId}`)
-        .then(response => {
-            if (!response.ok) {
-                throw new Error('获取数据失败');
-            }
-            return response.json();
-        })
-        .then(data => {
-            if (data.length === 0) {
+    fetchClientDataPage(clientId, null)
+        .then(page => {
+            if (page.items.length === 0) {
                 contentDiv.innerHTML = '<div class="text-center p-3"><i class="fas fa-database"></i><p>该应用暂无用户存储数据</p></div>';
             } else {
-                let html = '<table class="data-table">';
+                let html = `<table class="data-table" id="data-table-${clientId}">`;
                 html += '<tr><th>键名</th><th>值</th><th>类型</th><th>更新时间</th><th>操作</th></tr>';
-
-                data.forEach(item => {
-                    let valueDisplay = item.value;
-                    if (typeof item.value === 'object') {
-                        valueDisplay = JSON.stringify(item.value, null, 2);
-                    }
-
-                    // Truncate long values for display
-                    let displayValue = valueDisplay;
-                    if (displayValue && displayValue.length > 100) {
-                        displayValue = displayValue.substring(0, 100) + '...';
-                    }
-
-                    html += `
-                        <tr>
-                            <td><strong>${escapeHtml(item.key)}</strong></td>
-                            <td>
-                                <div title="${escapeHtml(valueDisplay)}">
-                                    <pre style="margin:0;max-width:200px;overflow:auto;background:rgba(0,0,0,0.3);padding:8px;border-radius:4px;cursor:help;">${escapeHtml(displayValue)}</pre>
-                                </div>
-                            </td>
-                            <td>${escapeHtml(item.type)}</td>
-                            <td>${new Date(item.updated_at).toLocaleString()}</td>
-                            <td>
-                                <button class="btn btn-danger" style="padding:6px 12px;font-size:0.8rem;"
-                                        onclick="deleteDataItem('${clientId}', '${escapeHtml(item.key)}')">
-                                    <i class="fas fa-trash"></i> 删除
-                                </button>
-                            </td>
-                        </tr>
-                    `;
+                page.items.forEach(item => {
+                    html += renderClientDataRow(clientId, item);
                 });
-
                 html += '</table>';
+                html += renderLoadMoreButton(clientId, page.next_cursor);
                 contentDiv.innerHTML = html;
             }
         })
@@ -476,6 +502,26 @@ function loadClientData(clientId) {
         });
 }
 
+function loadMoreClientData(clientId, cursor) {
+    const moreDiv = document.getElementById(`data-more-${clientId}`);
+    moreDiv.innerHTML = '<i class="fas fa-spinner fa-spin"></i>';
+
+    fetchClientDataPage(clientId, cursor)
+        .then(page => {
+            const table = document.getElementById(`data-table-${clientId}`);
+            let rows = '';
+            page.items.forEach(item => {
+                rows += renderClientDataRow(clientId, item);
+            });
+            table.insertAdjacentHTML('beforeend', rows);
+            moreDiv.outerHTML = renderLoadMoreButton(clientId, page.next_cursor);
+        })
+        .catch(error => {
+            showToast(`加载失败: ${error.message}`, 'error');
+            moreDiv.outerHTML = renderLoadMoreButton(clientId, cursor);
+        });
+}
+
 function clearClientData(clientId) {
     confirmAction(
         '确定要清除该应用的所有用户数据吗？此操作不可撤销，所有用户存储的数据都将被删除！',
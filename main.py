@@ -8,7 +8,10 @@ from email.mime.text import MIMEText
 from email.header import Header
 import random
 import string
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory, abort, g
+import time
+import click
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory, abort, g, \
+    Response, stream_with_context
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
@@ -16,13 +19,27 @@ from werkzeug.security import generate_password_hash, check_password_hash
 import secrets
 from datetime import datetime, timedelta, timezone
 import json
+import math
 import base64
+import hashlib
+import operator
+import threading
+import zlib
+from collections import OrderedDict
 from io import BytesIO
 from PIL import Image
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
 from flask_cors import CORS
 from functools import wraps
-from sqlalchemy import distinct, Text, String, DateTime, Integer, Boolean
-from sqlalchemy.dialects.mysql import MEDIUMTEXT
+from werkzeug.local import LocalProxy
+from sqlalchemy import distinct, func, case, or_, and_, select, tuple_, literal, literal_column, cast, Text, String, \
+    CHAR, DateTime, Integer, BigInteger, Boolean, LargeBinary, UniqueConstraint
+from sqlalchemy.types import TypeDecorator, UserDefinedType
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.dialects.mysql import MEDIUMTEXT, insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from urllib.parse import urlencode
 from dotenv import load_dotenv
 
@@ -37,8 +54,15 @@ if os.getenv('USE_CORS', 'False').lower() in ('true', '1', 't'):
 
 # SECRET_KEY配置
 app.config['SECRET_KEY'] = os.getenv("SECRET_KEY", secrets.token_hex(16))
+
+# 签名访问令牌的Ed25519私钥种子(base64url编码的32字节); 未设置时由SECRET_KEY派生
+TOKEN_SIGNING_KEY = os.getenv("TOKEN_SIGNING_KEY")
 app.json.ensure_ascii = False
 
+# 后台清理线程: python main.py 直接运行时启动；WSGI部署（如gunicorn）中只在设置了RUN_SWEEPER的进程中启动，
+# 避免每个worker各自清理；flask命令行（db upgrade / sweep / check-indexes等）导入本模块时不启动
+RUN_SWEEPER = os.getenv('RUN_SWEEPER', 'False').lower() in ('true', '1', 't')
+
 # PLUGINS配置
 USE_PLUGINS = os.getenv('USE_PLUGINS', 'False').lower() in ('true', '1', 't')
 PLUGINS_DIR = os.getenv("PLUGIN_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "plugins"))
@@ -145,6 +169,87 @@ def create_default_configs():
             'category': 'security',
             'is_public': False
         },
+        {
+            'key': 'token_expire_minutes',
+            'value': '0',
+            'value_type': 'number',
+            'description': '访问令牌有效分钟数; >0 时覆盖token_expire_days(配合刷新令牌使用短期访问令牌)',
+            'category': 'security',
+            'is_public': False
+        },
+        {
+            'key': 'refresh_token_expire_days',
+            'value': '30',
+            'value_type': 'number',
+            'description': '刷新令牌过期天数(每次使用后轮换)',
+            'category': 'security',
+            'is_public': False
+        },
+        {
+            'key': 'sweeper_interval',
+            'value': '0',
+            'value_type': 'number',
+            'description': '后台清理过期令牌/授权码/验证码的间隔秒数; 0 = 不启动后台线程(可使用 flask sweep 命令配合cron); '
+                           'WSGI部署时只在设置了RUN_SWEEPER环境变量的进程中启动',
+            'category': 'performance',
+            'is_public': False
+        },
+        {
+            'key': 'sweeper_batch_size',
+            'value': '1000',
+            'value_type': 'number',
+            'description': '清理时每批删除的最大行数',
+            'category': 'performance',
+            'is_public': False
+        },
+        {
+            'key': 'client_data_max_rows_per_user',
+            'value': '0',
+            'value_type': 'number',
+            'description': '每个应用为每个用户最多存储的数据条数; 0 = 不限制',
+            'category': 'performance',
+            'is_public': False
+        },
+        {
+            'key': 'client_data_max_bytes_per_user',
+            'value': '0',
+            'value_type': 'number',
+            'description': '每个应用为每个用户最多存储的数据字节数(按序列化后的JSON计算); 0 = 不限制',
+            'category': 'performance',
+            'is_public': False
+        },
+        {
+            'key': 'client_data_max_rows_per_client',
+            'value': '0',
+            'value_type': 'number',
+            'description': '每个应用最多存储的数据条数(所有用户合计); 0 = 不限制',
+            'category': 'performance',
+            'is_public': False
+        },
+        {
+            'key': 'client_data_max_bytes_per_client',
+            'value': '0',
+            'value_type': 'number',
+            'description': '每个应用最多存储的数据字节数(所有用户合计); 0 = 不限制',
+            'category': 'performance',
+            'is_public': False
+        },
+        {
+            'key': 'client_data_change_retention_days',
+            'value': '7',
+            'value_type': 'number',
+            'description': '第三方存储数据变更记录(变更订阅)保留天数; 游标早于保留范围的订阅方需重新全量同步',
+            'category': 'performance',
+            'is_public': False
+        },
+        {
+            'key': 'authorization_code_retention_days',
+            'value': '30',
+            'value_type': 'number',
+            'description': '已使用或已过期的授权码保留天数(授权码同时作为授权历史用于统计)',
+            'category': 'performance',
+            'is_public': False
+        },
         {
             'key': 'not_load_plugins',
             'value': ';',
@@ -152,6 +257,46 @@ def create_default_configs():
             'description': '禁止加载的插件(填写模块名, 不带文件后缀); 分号隔开',
             'category': 'plugins',
             'is_public': False
+        },
+        {
+            'key': 'access_token_format',
+            'value': 'opaque',
+            'value_type': 'string',
+            'description': '访问令牌格式: opaque = 随机字符串(需查询数据库校验); jwt = Ed25519签名的自包含令牌(可本地校验)',
+            'category': 'security',
+            'is_public': False
+        },
+        {
+            'key': 'token_cache_size',
+            'value': '10000',
+            'value_type': 'number',
+            'description': '访问令牌缓存的最大条目数; 0 = 关闭缓存',
+            'category': 'performance',
+            'is_public': False
+        },
+        {
+            'key': 'token_cache_ttl',
+            'value': '60',
+            'value_type': 'number',
+            'description': '访问令牌缓存有效秒数(多进程部署时, 撤销操作在其他进程中最多延迟该时间生效)',
+            'category': 'performance',
+            'is_public': False
+        },
+        {
+            'key': 'client_data_compress_threshold',
+            'value': '4096',
+            'value_type': 'number',
+            'description': '第三方存储数据序列化后超过该字节数时使用zlib压缩存储; 0 = 不压缩',
+            'category': 'performance',
+            'is_public': False
+        },
+        {
+            'key': 'client_data_dedup_threshold',
+            'value': '0',
+            'value_type': 'number',
+            'description': '第三方存储数据序列化后达到该字节数时按内容去重存储（相同的值只存一份）; 0 = 不去重',
+            'category': 'performance',
+            'is_public': False
         }
     ]
     for app_config_name, app_config_value in app.config.items():
@@ -231,6 +376,25 @@ login_manager.init_app(app)
 login_manager.login_view = 'login'
 
 
+class MySQLJSONColumn(UserDefinedType):
+    """MySQL原生JSON列，按文本读写（不经过SQLAlchemy JSON类型的序列化）"""
+    cache_ok = True
+
+    def get_col_spec(self, **kw):
+        return 'JSON'
+
+
+class JSONText(TypeDecorator):
+    """已序列化的JSON文本: MySQL使用原生JSON类型, SQLite使用TEXT并通过JSON1函数查询"""
+    impl = Text
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'mysql':
+            return dialect.type_descriptor(MySQLJSONColumn())
+        return dialect.type_descriptor(Text())
+
+
 # 数据库兼容性包装类
 class DatabaseCompat:
     """数据库兼容性包装类，统一SQLite和MySQL的API差异"""
@@ -257,6 +421,11 @@ class DatabaseCompat:
         """统一的字符串类型"""
         return String(length)
 
+    @staticmethod
+    def digest_type():
+        """定长的SHA-256摘要类型（64位十六进制）"""
+        return CHAR(64)
+
     @staticmethod
     def datetime_type():
         """统一的日期时间类型"""
@@ -267,6 +436,11 @@ class DatabaseCompat:
         """统一的整数类型"""
         return Integer
 
+    @staticmethod
+    def big_integer_type():
+        """统一的长整数类型"""
+        return BigInteger
+
     @staticmethod
     def boolean_type():
         """统一的布尔类型"""
@@ -280,6 +454,105 @@ class DatabaseCompat:
         else:
             return Text
 
+    @staticmethod
+    def load_binary_type():
+        """统一的大二进制类型"""
+        if USE_MYSQL:
+            from sqlalchemy.dialects.mysql import LONGBLOB
+            return LONGBLOB
+        else:
+            return LargeBinary
+
+    @staticmethod
+    def json_type():
+        """统一的JSON文本类型（MySQL JSON / SQLite TEXT + JSON1）"""
+        return JSONText
+
+    @staticmethod
+    def json_extract(column, path):
+        """取JSON路径上的值; 路径已校验, 以字面量写入SQL以便匹配表达式索引"""
+        return func.json_extract(column, literal_column(f"'{path}'"))
+
+    @staticmethod
+    def json_literal(value):
+        """与json_extract结果比较的值: MySQL转换为JSON比较, SQLite的json_extract直接返回SQL值"""
+        if USE_MYSQL:
+            return cast(literal(json.dumps(value)), MySQLJSONColumn())
+        return literal(value)
+
+    @staticmethod
+    def json_exists(column, path):
+        """JSON路径存在且不为null"""
+        if USE_MYSQL:
+            return func.json_type(DatabaseCompat.json_extract(column, path)) != 'NULL'
+        return DatabaseCompat.json_extract(column, path).isnot(None)
+
+    @staticmethod
+    def json_type_is(column, path, kind):
+        """JSON路径上的值属于给定类型（string / number / boolean）; 两种数据库的JSON类型名不同"""
+        if USE_MYSQL:
+            names = {'string': ('STRING',), 'number': ('INTEGER', 'UNSIGNED INTEGER', 'DOUBLE', 'DECIMAL'),
+                     'boolean': ('BOOLEAN',)}[kind]
+            return func.json_type(DatabaseCompat.json_extract(column, path)).in_(names)
+        names = {'string': ('text',), 'number': ('integer', 'real'), 'boolean': ('true', 'false')}[kind]
+        return func.json_type(column, literal_column(f"'{path}'")).in_(names)
+
+    @staticmethod
+    def json_generated_column(column_name, path, kind):
+        """
+        JSON路径生成列的定义（VIRTUAL，只占索引空间）
+        MySQL需要标量类型才能建索引, 按kind用JSON_VALUE转换; SQLite生成列无类型, 与json_extract一致
+        """
+        if USE_MYSQL:
+            returning = 'DOUBLE' if kind == 'number' else 'CHAR(191)'
+            column_type = 'DOUBLE' if kind == 'number' else 'VARCHAR(191)'
+            return (f"{column_type} GENERATED ALWAYS AS "
+                    f"(JSON_VALUE({column_name}, '{path}' RETURNING {returning} NULL ON ERROR)) VIRTUAL")
+        # 未迁移的旧数据可能不是JSON, 跳过这些行以免建索引和写入时报错
+        return (f"GENERATED ALWAYS AS (json_extract(CASE WHEN json_valid({column_name}) THEN {column_name} END, "
+                f"'{path}')) VIRTUAL")
+
+    @staticmethod
+    def upsert(model, rows, update_columns, increment_columns=(), accumulate_columns=()):
+        """
+        统一的原生upsert语句（单条语句写入多行）
+        冲突时: update_columns取新值, increment_columns加1, accumulate_columns加上新值
+        SQLite: INSERT ... ON CONFLICT DO UPDATE; MySQL: INSERT ... ON DUPLICATE KEY UPDATE
+        SQLite需要给出冲突目标, 取模型上的第一个唯一约束
+        """
+        table = model.__table__
+        if USE_MYSQL:
+            stmt = mysql_insert(table).values(rows)
+            new_values = stmt.inserted
+        else:
+            stmt = sqlite_insert(table).values(rows)
+            new_values = stmt.excluded
+
+        set_ = {column: new_values[column] for column in update_columns}
+        set_.update({column: table.c[column] + 1 for column in increment_columns})
+        set_.update({column: table.c[column] + new_values[column] for column in accumulate_columns})
+
+        if USE_MYSQL:
+            return stmt.on_duplicate_key_update(set_)
+        return stmt.on_conflict_do_update(index_elements=DatabaseCompat.unique_columns(table), set_=set_)
+
+    @staticmethod
+    def insert_ignore(model, rows):
+        """统一的 INSERT，唯一键已存在时忽略该行（通过rowcount判断是否写入）"""
+        table = model.__table__
+        if USE_MYSQL:
+            return mysql_insert(table).values(rows).prefix_with('IGNORE')
+
+        return sqlite_insert(table).values(rows).on_conflict_do_nothing(
+            index_elements=DatabaseCompat.unique_columns(table)
+        )
+
+    @staticmethod
+    def unique_columns(table):
+        """表上第一个唯一约束的列名（SQLite冲突目标）"""
+        unique = next(constraint for constraint in table.constraints if isinstance(constraint, UniqueConstraint))
+        return [column.name for column in unique.columns]
+
 
 # 网站配置模型
 class SiteConfig(db.Model):
@@ -445,6 +718,11 @@ class EmailVerificationCode(db.Model):
     expires_at = db.Column(DatabaseCompat.datetime_type(), nullable=False)
     used = db.Column(DatabaseCompat.boolean_type(), default=False)
 
+    # verify_email_code: email + code + used + expires_at
+    __table_args__ = (
+        db.Index('ix_email_verification_code_lookup', 'email', 'code', 'used', 'expires_at'),
+    )
+
 
 # 用户模型
 class User(UserMixin, db.Model):
@@ -474,13 +752,595 @@ class ClientUserData(db.Model):
     client_id = db.Column(DatabaseCompat.string_type(40), nullable=False)  # 第三方客户端ID
     user_id = db.Column(DatabaseCompat.integer_type(), db.ForeignKey('user.id'), nullable=False)  # 用户ID
     data_key = db.Column(DatabaseCompat.string_type(200), nullable=False)  # 数据键名
-    data_value = db.Column(DatabaseCompat.load_text_type())  # 数据值（JSON格式）
+    data_value = db.Column(DatabaseCompat.json_type())  # 数据值（JSON格式, MySQL为原生JSON列）
     data_type = db.Column(DatabaseCompat.string_type(50))  # 数据类型
+    # 存储编码: None = 旧数据(可能不是JSON, 迁移0009已规范化为json); json = data_value为JSON; zlib = data_compressed为压缩后的JSON
+    # blob = 值存储在blob_id指向的ClientDataBlob中（按内容去重）
+    data_codec = db.Column(DatabaseCompat.string_type(10))
+    blob_id = db.Column(DatabaseCompat.integer_type())  # 去重存储的值块ID
+    data_compressed = db.Column(DatabaseCompat.load_binary_type())  # 压缩后的数据值
+    data_size = db.Column(DatabaseCompat.integer_type())  # 未压缩JSON的字节数
+    version = db.Column(DatabaseCompat.integer_type(), nullable=False, default=1, server_default='1')  # 每次写入递增
+    expires_at = db.Column(DatabaseCompat.datetime_type())  # 写入时指定ttl的过期时间, 为空则永久保存
     created_at = db.Column(DatabaseCompat.datetime_type(), default=get_utc_now)
     updated_at = db.Column(DatabaseCompat.datetime_type(), default=get_utc_now, onupdate=get_utc_now)
 
-    # 唯一约束：同一客户端同一用户的相同键名只能有一条记录
-    __table_args__ = (db.UniqueConstraint('client_id', 'user_id', 'data_key', name='_client_user_key_uc'),)
+    # 唯一约束：同一客户端同一用户的相同键名只能有一条记录（同时覆盖按client_id的查询）
+    __table_args__ = (
+        db.UniqueConstraint('client_id', 'user_id', 'data_key', name='_client_user_key_uc'),
+        db.Index('ix_client_user_data_user_client', 'user_id', 'client_id'),
+        db.Index('ix_client_user_data_expires_at', 'expires_at'),
+        # 值块引用计数重建和按值块查找引用行
+        db.Index('ix_client_user_data_blob_id', 'blob_id'),
+    )
+
+
+# 第三方存储数据变更记录（变更订阅），自增ID即为变更序号
+# SQLite需要AUTOINCREMENT，否则删除最新的记录后序号会被重新分配，订阅方会漏掉新变更
+class ClientDataChange(db.Model):
+    id = db.Column(DatabaseCompat.integer_type(), primary_key=True)
+    client_id = db.Column(DatabaseCompat.string_type(40), nullable=False)
+    user_id = db.Column(DatabaseCompat.integer_type(), nullable=False)
+    data_key = db.Column(DatabaseCompat.string_type(200), nullable=False)
+    op = db.Column(DatabaseCompat.string_type(10), nullable=False)  # upsert / delete
+    created_at = db.Column(DatabaseCompat.datetime_type(), default=get_utc_now, nullable=False, index=True)
+
+    __table_args__ = (
+        db.Index('ix_client_data_change_client_seq', 'client_id', 'id'),
+        {'sqlite_autoincrement': True},
+    )
+
+
+# 第三方存储数据用量计数（user_id为0的行是应用合计），与数据写入/删除在同一事务中增量更新
+class ClientDataUsage(db.Model):
+    id = db.Column(DatabaseCompat.integer_type(), primary_key=True)
+    client_id = db.Column(DatabaseCompat.string_type(40), nullable=False)
+    user_id = db.Column(DatabaseCompat.integer_type(), nullable=False)
+    row_count = db.Column(DatabaseCompat.big_integer_type(), nullable=False, default=0)
+    byte_count = db.Column(DatabaseCompat.big_integer_type(), nullable=False, default=0)
+    updated_at = db.Column(DatabaseCompat.datetime_type(), default=get_utc_now, onupdate=get_utc_now)
+
+    __table_args__ = (
+        db.UniqueConstraint('client_id', 'user_id', name='_client_data_usage_uc'),
+    )
+
+
+# 按内容去重的第三方存储数据值块，ref_count为引用该值块的ClientUserData行数（与数据写入/删除在同一事务中增减）
+class ClientDataBlob(db.Model):
+    id = db.Column(DatabaseCompat.integer_type(), primary_key=True)
+    digest = db.Column(DatabaseCompat.digest_type(), nullable=False, unique=True)  # 编码+存储内容的SHA-256
+    data_codec = db.Column(DatabaseCompat.string_type(10), nullable=False)  # json / zlib
+    data_value = db.Column(DatabaseCompat.json_type())
+    data_compressed = db.Column(DatabaseCompat.load_binary_type())
+    data_size = db.Column(DatabaseCompat.integer_type(), nullable=False)
+    ref_count = db.Column(DatabaseCompat.big_integer_type(), nullable=False, default=0, index=True)
+    created_at = db.Column(DatabaseCompat.datetime_type(), default=get_utc_now)
+
+
+class ClientDataQuota:
+    """第三方存储数据用量计数与配额检查工具类"""
+
+    # 启动时由配置 client_data_max_* 覆盖; 0 = 不限制
+    limits = {'rows_per_user': 0, 'bytes_per_user': 0, 'rows_per_client': 0, 'bytes_per_client': 0}
+
+    @staticmethod
+    def size_expression():
+        """单行数据计入用量的字节数（旧数据按存储长度计算）"""
+        return func.coalesce(ClientUserData.data_size, func.length(ClientUserData.data_value), 0)
+
+    @staticmethod
+    def row_size(row):
+        """与size_expression一致的单行字节数"""
+        return row.data_size if row.data_size is not None else len(row.data_value or '')
+
+    @staticmethod
+    def existing_rows(client_id, user_id, keys):
+        """
+        已有数据的字节数和引用的值块，用于计算写入后的用量和引用计数变化（MySQL下锁定这些行）
+        返回 {键名: (字节数, 值块ID)}
+        """
+        if not keys:
+            return {}
+        rows = db.session.query(
+            ClientUserData.data_key, ClientDataQuota.size_expression(), ClientUserData.blob_id
+        ).filter(
+            ClientUserData.client_id == client_id,
+            ClientUserData.user_id == user_id,
+            ClientUserData.data_key.in_(keys)
+        ).with_for_update().all()
+        return {key: (size, blob_id) for key, size, blob_id in rows}
+
+    @staticmethod
+    def usage(client_id, user_id=None, for_update=False):
+        """
+        读取用量计数，返回 {'client': (条数, 字节数), 'user': (条数, 字节数)}
+        for_update: 加锁读取（MySQL下读到最新提交的计数而不是事务快照）
+        """
+        user_ids = [0] if user_id is None else [0, user_id]
+        query = db.session.query(ClientDataUsage.user_id, ClientDataUsage.row_count, ClientDataUsage.byte_count) \
+            .filter(ClientDataUsage.client_id == client_id, ClientDataUsage.user_id.in_(user_ids))
+        if for_update:
+            query = query.with_for_update()
+        rows = query.all()
+        counts = {row.user_id: (row.row_count, row.byte_count) for row in rows}
+        return {'client': counts.get(0, (0, 0)), 'user': counts.get(user_id, (0, 0))}
+
+    @staticmethod
+    def lock(client_id, user_id):
+        """
+        锁定用户行和应用合计行直到事务结束（不存在时以0创建）
+        累加0的upsert在MySQL中取得行锁，在SQLite中取得数据库写锁
+        """
+        now = get_utc_now()
+        db.session.execute(DatabaseCompat.upsert(
+            ClientDataUsage,
+            [{'client_id': client_id, 'user_id': uid, 'row_count': 0, 'byte_count': 0, 'updated_at': now}
+             for uid in (user_id, 0)],
+            update_columns=[],
+            accumulate_columns=['row_count']
+        ))
+
+    @staticmethod
+    def check(client_id, user_id, delta_rows, delta_bytes):
+        """
+        检查写入后是否超出配额，返回错误描述或None；只在用量增加时检查
+        先锁定用量行再读取，并发写入同一用户或应用时依次检查，不会都按旧用量通过后一起超出配额
+        """
+        limits = ClientDataQuota.limits
+        if delta_rows <= 0 and delta_bytes <= 0 or not any(limits.values()):
+            return None
+
+        ClientDataQuota.lock(client_id, user_id)
+        usage = ClientDataQuota.usage(client_id, user_id, for_update=True)
+        checks = [
+            ('rows_per_user', usage['user'][0] + delta_rows, delta_rows, '该用户的数据条数'),
+            ('bytes_per_user', usage['user'][1] + delta_bytes, delta_bytes, '该用户的数据大小'),
+            ('rows_per_client', usage['client'][0] + delta_rows, delta_rows, '应用的数据条数'),
+            ('bytes_per_client', usage['client'][1] + delta_bytes, delta_bytes, '应用的数据大小'),
+        ]
+        for name, total, delta, label in checks:
+            if limits[name] and delta > 0 and total > limits[name]:
+                return f'{label}超出配额（上限 {limits[name]}）'
+        return None
+
+    @staticmethod
+    def apply(client_id, user_id, delta_rows, delta_bytes):
+        """在当前事务中累加用量（用户行和应用合计行）"""
+        if not delta_rows and not delta_bytes:
+            return
+
+        now = get_utc_now()
+        db.session.execute(DatabaseCompat.upsert(
+            ClientDataUsage,
+            [{'client_id': client_id, 'user_id': uid, 'row_count': delta_rows, 'byte_count': delta_bytes,
+              'updated_at': now} for uid in (user_id, 0)],
+            update_columns=['updated_at'],
+            accumulate_columns=['row_count', 'byte_count']
+        ))
+
+    @staticmethod
+    def apply_deletes(*conditions):
+        """删除数据前按 (client_id, user_id) 汇总将被删除的行并扣减用量"""
+        groups = db.session.query(
+            ClientUserData.client_id, ClientUserData.user_id,
+            func.count(ClientUserData.id), func.sum(ClientDataQuota.size_expression())
+        ).filter(*conditions).group_by(ClientUserData.client_id, ClientUserData.user_id).all()
+
+        for client_id, user_id, count, size in groups:
+            ClientDataQuota.apply(client_id, user_id, -count, -int(size or 0))
+
+    @staticmethod
+    def purge(client_id=None, user_id=None):
+        """删除应用的全部数据（或删除用户）时清除对应的用量行"""
+        query = ClientDataUsage.query
+        if client_id is not None:
+            query = query.filter(ClientDataUsage.client_id == client_id)
+        if user_id is not None:
+            query = query.filter(ClientDataUsage.user_id == user_id)
+        query.delete(synchronize_session=False)
+
+    @staticmethod
+    def rebuild():
+        """全量重新统计用量（维护命令使用）"""
+        ClientDataUsage.query.delete(synchronize_session=False)
+        groups = db.session.query(
+            ClientUserData.client_id, ClientUserData.user_id,
+            func.count(ClientUserData.id), func.sum(ClientDataQuota.size_expression())
+        ).group_by(ClientUserData.client_id, ClientUserData.user_id).all()
+
+        for client_id, user_id, count, size in groups:
+            ClientDataQuota.apply(client_id, user_id, count, int(size or 0))
+        return len(groups)
+
+
+class RawJSON:
+    """已是合法JSON的文本，由dumps_raw_json原样拼接，不再解析和重新编码"""
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+
+def dumps_raw_json(obj):
+    """序列化为JSON文本，其中的RawJSON原样拼接"""
+    if isinstance(obj, RawJSON):
+        return obj.text
+    if isinstance(obj, dict):
+        return '{' + ','.join(json.dumps(str(key), ensure_ascii=False) + ':' + dumps_raw_json(value)
+                              for key, value in obj.items()) + '}'
+    if isinstance(obj, (list, tuple)):
+        return '[' + ','.join(dumps_raw_json(value) for value in obj) + ']'
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def raw_json_response(obj):
+    """以dumps_raw_json构造JSON响应"""
+    return Response(dumps_raw_json(obj), mimetype='application/json')
+
+
+class ClientDataCodec:
+    """第三方存储数据的编解码工具类，较大的值透明地使用zlib压缩"""
+
+    # 启动时由配置 client_data_compress_threshold 覆盖
+    compress_threshold = 4096
+
+    @staticmethod
+    def encode(value):
+        """将值编码为待写入的列"""
+        # 只有None存为空值; {}、[]、0、False、"" 都是需要原样保存的JSON值
+        encoded = json.dumps(value) if value is not None else None
+        if encoded is None:
+            return {'data_codec': 'json', 'data_value': None, 'data_compressed': None, 'data_size': 0}
+
+        raw = encoded.encode('utf-8')
+        threshold = ClientDataCodec.compress_threshold
+        if threshold and len(raw) >= threshold:
+            compressed = zlib.compress(raw)
+            # 压缩无收益时（如随机数据）仍按原样存储
+            if len(compressed) < len(raw):
+                return {'data_codec': 'zlib', 'data_value': None, 'data_compressed': compressed,
+                        'data_size': len(raw)}
+
+        return {'data_codec': 'json', 'data_value': encoded, 'data_compressed': None, 'data_size': len(raw)}
+
+    @staticmethod
+    def decode(codec, data_value, data_compressed):
+        """解析存储的值（旧数据可能为纯文本）"""
+        if codec == 'zlib':
+            return json.loads(zlib.decompress(data_compressed))
+        if not data_value:
+            return None
+        if codec == 'json':
+            return json.loads(data_value)
+        try:
+            return json.loads(data_value)
+        except json.JSONDecodeError:
+            return data_value
+
+    @staticmethod
+    def raw(codec, data_value, data_compressed):
+        """返回可直接拼接进响应的JSON文本（RawJSON）；只有旧数据需要解析校验"""
+        if codec == 'zlib':
+            return RawJSON(zlib.decompress(data_compressed).decode('utf-8'))
+        if not data_value:
+            return RawJSON('null')
+        if codec == 'json':
+            return RawJSON(data_value)
+        try:
+            json.loads(data_value)
+            return RawJSON(data_value)
+        except json.JSONDecodeError:
+            return RawJSON(json.dumps(data_value))
+
+    @staticmethod
+    def storage_stats(client_id=None):
+        """统计存储字节数与原始字节数（旧数据按存储长度计算原始大小）"""
+        stored_size = func.coalesce(func.length(ClientUserData.data_value), 0) + \
+            func.coalesce(func.length(ClientUserData.data_compressed), 0)
+        raw_size = func.coalesce(ClientUserData.data_size, func.length(ClientUserData.data_value), 0)
+
+        query = db.session.query(
+            func.count(ClientUserData.id),
+            func.sum(raw_size),
+            func.sum(stored_size),
+            func.sum(case((ClientUserData.data_codec == 'zlib', 1), else_=0))
+        )
+        if client_id is not None:
+            query = query.filter(ClientUserData.client_id == client_id)
+
+        rows, raw_bytes, stored_bytes, compressed_rows = query.one()
+        dedup = ClientDataBlobStore.stats(client_id)
+        raw_bytes = int(raw_bytes or 0)
+        # 去重的值按值块计算一次存储
+        stored_bytes = int(stored_bytes or 0) + dedup['blob_bytes']
+        return {
+            'rows': rows,
+            'compressed_rows': int(compressed_rows or 0),
+            'raw_bytes': raw_bytes,
+            'stored_bytes': stored_bytes,
+            'ratio': round(stored_bytes / raw_bytes, 4) if raw_bytes else None,
+            'compress_threshold': ClientDataCodec.compress_threshold,
+            **dedup,
+            'dedup_threshold': ClientDataBlobStore.threshold
+        }
+
+
+class ClientDataBlobStore:
+    """
+    第三方存储数据按内容去重的工具类
+    达到阈值的值写入ClientDataBlob（按编码后内容的摘要唯一），数据行只保存值块ID；
+    引用计数在写入时先增加、覆盖或删除数据行时减少，归零的值块由后台清理删除
+    """
+
+    # 启动时由配置 client_data_dedup_threshold 覆盖; 0 = 不去重
+    threshold = 0
+
+    @staticmethod
+    def digest(row):
+        """编码后存储内容的摘要（相同的值、相同的编码得到相同的摘要）"""
+        payload = row['data_compressed'] if row['data_codec'] == 'zlib' else row['data_value'].encode('utf-8')
+        return hashlib.sha256(row['data_codec'].encode('ascii') + b':' + payload).hexdigest()
+
+    @staticmethod
+    def attach(rows):
+        """
+        将达到阈值的待写入行改为引用值块（原地修改），并在当前事务中为每一行增加一次引用
+        以upsert累加引用计数: 值块已存在时加锁, 不会被并发的清理删除
+        """
+        threshold = ClientDataBlobStore.threshold
+        candidates = [row for row in rows if threshold and row['data_size'] >= threshold]
+        if not candidates:
+            return
+
+        blobs = {}
+        for row in candidates:
+            digest = ClientDataBlobStore.digest(row)
+            row['_digest'] = digest
+            if digest in blobs:
+                blobs[digest]['ref_count'] += 1
+            else:
+                blobs[digest] = {
+                    'digest': digest, 'data_codec': row['data_codec'], 'data_value': row['data_value'],
+                    'data_compressed': row['data_compressed'], 'data_size': row['data_size'],
+                    'ref_count': 1, 'created_at': get_utc_now()
+                }
+
+        db.session.execute(DatabaseCompat.upsert(
+            ClientDataBlob, list(blobs.values()), update_columns=[], accumulate_columns=['ref_count']
+        ))
+        ids = dict(db.session.query(ClientDataBlob.digest, ClientDataBlob.id).filter(
+            ClientDataBlob.digest.in_(blobs)).all())
+
+        for row in candidates:
+            row.update(data_codec='blob', data_value=None, data_compressed=None, blob_id=ids[row.pop('_digest')])
+
+    @staticmethod
+    def adjust(deltas):
+        """按 {值块ID: 变化量} 调整引用计数"""
+        table = ClientDataBlob.__table__
+        for blob_id, delta in deltas.items():
+            if delta:
+                db.session.execute(table.update().where(table.c.id == blob_id).values(
+                    ref_count=table.c.ref_count + delta))
+
+    @staticmethod
+    def release(*conditions):
+        """删除数据前按值块汇总将被删除的行并减少引用计数"""
+        groups = db.session.query(ClientUserData.blob_id, func.count(ClientUserData.id)).filter(
+            *conditions, ClientUserData.blob_id.isnot(None)
+        ).group_by(ClientUserData.blob_id).all()
+        ClientDataBlobStore.adjust({blob_id: -count for blob_id, count in groups})
+
+    @staticmethod
+    def rebuild():
+        """按数据行重新统计全部值块的引用计数（维护命令使用），返回值块数量"""
+        table = ClientDataBlob.__table__
+        references = select(func.count(ClientUserData.id)).where(ClientUserData.blob_id == table.c.id) \
+            .scalar_subquery()
+        return db.session.execute(table.update().values(ref_count=references)).rowcount
+
+    @staticmethod
+    def value_columns():
+        """读取值所需的列，值块中的内容优先（需要配合join使用）"""
+        return (
+            func.coalesce(ClientDataBlob.data_codec, ClientUserData.data_codec).label('data_codec'),
+            func.coalesce(ClientDataBlob.data_value, ClientUserData.data_value).label('data_value'),
+            func.coalesce(ClientDataBlob.data_compressed, ClientUserData.data_compressed).label('data_compressed'),
+        )
+
+    @staticmethod
+    def join(query):
+        """为读取值的查询关联值块表"""
+        return query.outerjoin(ClientDataBlob, ClientDataBlob.id == ClientUserData.blob_id)
+
+    @staticmethod
+    def stats(client_id=None):
+        """去重存储统计: 引用值块的行数、值块数量及其存储字节数（按应用统计时为该应用引用的值块）"""
+        rows = db.session.query(func.count(ClientUserData.id)).filter(ClientUserData.blob_id.isnot(None))
+        blobs = db.session.query(
+            func.count(ClientDataBlob.id),
+            func.sum(func.coalesce(func.length(ClientDataBlob.data_value), 0) +
+                     func.coalesce(func.length(ClientDataBlob.data_compressed), 0))
+        )
+        if client_id is not None:
+            rows = rows.filter(ClientUserData.client_id == client_id)
+            blobs = blobs.filter(ClientDataBlob.id.in_(
+                db.session.query(ClientUserData.blob_id).filter(ClientUserData.client_id == client_id)
+            ))
+
+        blob_count, blob_bytes = blobs.one()
+        return {'deduplicated_rows': rows.scalar(), 'blobs': blob_count, 'blob_bytes': int(blob_bytes or 0)}
+
+
+class ClientDataJSONQuery:
+    """
+    按JSON路径条件查询第三方存储数据
+    未压缩的数据在SQL中用JSON函数过滤（可使用生成列索引），去重存储的值在值块表上过滤；
+    zlib压缩的数据无法在SQL中解析，读出后在Python中过滤
+    """
+
+    # 路径仅支持 $.字段 和 $[下标]，校验后可安全地写入SQL字面量
+    PATH_PATTERN = re.compile(r'^\$(\.[A-Za-z_][A-Za-z0-9_]*|\[\d+\])+$')
+    SEGMENT_PATTERN = re.compile(r'\.([A-Za-z_][A-Za-z0-9_]*)|\[(\d+)\]')
+    OPERATORS = {
+        'eq': operator.eq, 'ne': operator.ne, 'gt': operator.gt,
+        'gte': operator.ge, 'lt': operator.lt, 'lte': operator.le, 'exists': None
+    }
+    MAX_PREDICATES = 10
+    INDEX_KINDS = ('string', 'number')
+
+    # 已存在的生成列名（首次使用时读取表结构）
+    _indexed_columns = None
+
+    @staticmethod
+    def parse_predicates(where):
+        """校验条件列表 [{"path", "op", "value"}], 返回 (条件列表, 错误信息)"""
+        if not isinstance(where, list) or not where:
+            return None, 'where必须是非空数组'
+        if len(where) > ClientDataJSONQuery.MAX_PREDICATES:
+            return None, f'条件最多 {ClientDataJSONQuery.MAX_PREDICATES} 个'
+
+        predicates = []
+        for predicate in where:
+            if not isinstance(predicate, dict):
+                return None, '条件必须是对象'
+            path = predicate.get('path')
+            op = predicate.get('op', 'eq')
+            value = predicate.get('value')
+            if not isinstance(path, str) or len(path) > 200 or not ClientDataJSONQuery.PATH_PATTERN.match(path):
+                return None, f'无效的JSON路径: {path}'
+            if op not in ClientDataJSONQuery.OPERATORS:
+                return None, f'不支持的操作符: {op}'
+            if op != 'exists' and (value is None or not isinstance(value, (str, int, float, bool))):
+                return None, f'{path} 的比较值必须是字符串、数字或布尔值'
+            predicates.append({'path': path, 'op': op, 'value': value})
+        return predicates, None
+
+    @staticmethod
+    def json_kind(value):
+        """JSON值的比较类型: string / number / boolean，其他（对象、数组、null）返回None"""
+        if isinstance(value, bool):
+            return 'boolean'
+        if isinstance(value, str):
+            return 'string'
+        if isinstance(value, (int, float)):
+            return 'number'
+        return None
+
+    @staticmethod
+    def value_kind(value):
+        """比较值对应的生成列类型（布尔值不使用索引）"""
+        kind = ClientDataJSONQuery.json_kind(value)
+        return None if kind == 'boolean' else kind
+
+    @staticmethod
+    def index_column(path, kind):
+        """JSON路径生成列的列名"""
+        return f"jx_{kind[0]}_{hashlib.sha256(path.encode('utf-8')).hexdigest()[:16]}"
+
+    @staticmethod
+    def indexed_columns():
+        """已创建的生成列（其他进程新建索引后需重启才会使用，删除索引见refresh_indexed_columns）"""
+        if ClientDataJSONQuery._indexed_columns is None:
+            columns = db.inspect(db.engine).get_columns(ClientUserData.__tablename__)
+            ClientDataJSONQuery._indexed_columns = {
+                column['name'] for column in columns if column['name'].startswith('jx_')
+            }
+        return ClientDataJSONQuery._indexed_columns
+
+    @staticmethod
+    def refresh_indexed_columns():
+        """重新读取生成列（其他进程删除索引后查询会报列不存在），返回是否有变化"""
+        cached = ClientDataJSONQuery._indexed_columns
+        ClientDataJSONQuery._indexed_columns = None
+        return ClientDataJSONQuery.indexed_columns() != cached
+
+    @staticmethod
+    def condition(predicate, column=None):
+        """
+        单个条件的SQL表达式，数据行上有对应生成列时直接比较生成列以使用其索引
+        比较前要求值的JSON类型与比较值一致: SQLite中文本总是大于数字, 不加限制时 "abc" > 5 成立而matches不成立
+        """
+        path, op, value = predicate['path'], predicate['op'], predicate['value']
+        column = ClientUserData.data_value if column is None else column
+        if op == 'exists':
+            return DatabaseCompat.json_exists(column, path)
+
+        kind = ClientDataJSONQuery.value_kind(value)
+        column_name = ClientDataJSONQuery.index_column(path, kind) if kind else None
+        if column is ClientUserData.data_value and column_name in ClientDataJSONQuery.indexed_columns():
+            left, right = literal_column(column_name), literal(value)
+        else:
+            left, right = DatabaseCompat.json_extract(column, path), DatabaseCompat.json_literal(value)
+        return and_(
+            DatabaseCompat.json_type_is(column, path, ClientDataJSONQuery.json_kind(value)),
+            ClientDataJSONQuery.OPERATORS[op](left, right)
+        )
+
+    @staticmethod
+    def extract(value, path):
+        """在Python中取JSON路径上的值，不存在时返回None"""
+        for name, index in ClientDataJSONQuery.SEGMENT_PATTERN.findall(path):
+            if name:
+                if not isinstance(value, dict):
+                    return None
+                value = value.get(name)
+            else:
+                if not isinstance(value, list) or int(index) >= len(value):
+                    return None
+                value = value[int(index)]
+        return value
+
+    @staticmethod
+    def matches(value, predicates):
+        """在Python中判断值是否满足全部条件（与SQL的比较语义一致: 缺失或类型不同的值不满足任何比较, 包括ne）"""
+        for predicate in predicates:
+            actual = ClientDataJSONQuery.extract(value, predicate['path'])
+            if predicate['op'] == 'exists':
+                if actual is None:
+                    return False
+                continue
+
+            expected = predicate['value']
+            if ClientDataJSONQuery.json_kind(actual) != ClientDataJSONQuery.json_kind(expected):
+                return False
+            if not ClientDataJSONQuery.OPERATORS[predicate['op']](actual, expected):
+                return False
+        return True
+
+    @staticmethod
+    def create_index(path, kind):
+        """为JSON路径创建生成列及 (client_id, data_key, 生成列) 索引，返回列名"""
+        table = ClientUserData.__tablename__
+        column_name = ClientDataJSONQuery.index_column(path, kind)
+        ClientDataJSONQuery._indexed_columns = None
+        if column_name not in ClientDataJSONQuery.indexed_columns():
+            definition = DatabaseCompat.json_generated_column('data_value', path, kind)
+            db.session.execute(db.text(f'ALTER TABLE {table} ADD COLUMN {column_name} {definition}'))
+        indexes = {index['name'] for index in db.inspect(db.engine).get_indexes(table)}
+        if f'ix_{column_name}' not in indexes:
+            db.session.execute(db.text(
+                f'CREATE INDEX ix_{column_name} ON {table} (client_id, data_key, {column_name})'
+            ))
+        db.session.commit()
+        return column_name
+
+    @staticmethod
+    def drop_index(path, kind):
+        """删除JSON路径的生成列及其索引，返回是否存在"""
+        table = ClientUserData.__tablename__
+        column_name = ClientDataJSONQuery.index_column(path, kind)
+        ClientDataJSONQuery._indexed_columns = None
+        if column_name not in ClientDataJSONQuery.indexed_columns():
+            return False
+        indexes = {index['name'] for index in db.inspect(db.engine).get_indexes(table)}
+        if f'ix_{column_name}' in indexes:
+            db.session.execute(db.text(
+                f'DROP INDEX ix_{column_name} ON {table}' if USE_MYSQL else f'DROP INDEX ix_{column_name}'
+            ))
+        db.session.execute(db.text(f'ALTER TABLE {table} DROP COLUMN {column_name}'))
+        db.session.commit()
+        return True
 
 
 # OAuth客户端模型
@@ -497,12 +1357,16 @@ class OAuthClient(db.Model):
     public_data_enabled = db.Column(DatabaseCompat.boolean_type(), default=False)
     data_access_token = db.Column(DatabaseCompat.string_type(100), unique=True, nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_oauth_client_user_id', 'user_id'),
+    )
 
-# 授权码模型 - 使用足够长的VARCHAR类型
+
+# 授权码模型 - 只保存授权码的SHA-256摘要
 class AuthorizationCode(db.Model):
     id = db.Column(DatabaseCompat.integer_type(), primary_key=True)
-    # 使用足够长的VARCHAR类型存储授权码
-    code = db.Column(DatabaseCompat.string_type(500), unique=True, nullable=False)
+    # 定长摘要, 唯一索引更窄且库中不保存明文
+    code = db.Column(DatabaseCompat.digest_type(), unique=True, nullable=False)
     client_id = db.Column(DatabaseCompat.string_type(40), nullable=False)
     redirect_uri = db.Column(DatabaseCompat.string_type(200), nullable=False)
     scope = db.Column(DatabaseCompat.text_type())  # 权限范围
@@ -510,17 +1374,67 @@ class AuthorizationCode(db.Model):
     user_id = db.Column(DatabaseCompat.integer_type(), db.ForeignKey('user.id'), nullable=False)
     used = db.Column(DatabaseCompat.boolean_type(), default=False)
 
+    __table_args__ = (
+        # stats_*: client_id IN (...) 统计不同的user_id
+        db.Index('ix_authorization_code_client_user', 'client_id', 'user_id'),
+        # get_authorized_apps / 授权详情: 按用户(和客户端)查询, 按expires_at取最近一次
+        db.Index('ix_authorization_code_user_client_expires', 'user_id', 'client_id', 'expires_at'),
+        # 月度统计、管理员授权列表排序和过期清理
+        db.Index('ix_authorization_code_expires_at', 'expires_at'),
+    )
+
 
-# 访问令牌模型 - 使用足够长的VARCHAR类型
+# 访问令牌模型 - 只保存令牌的SHA-256摘要
 class AccessToken(db.Model):
     id = db.Column(DatabaseCompat.integer_type(), primary_key=True)
-    # 使用足够长的VARCHAR类型存储访问令牌
-    token = db.Column(DatabaseCompat.string_type(500), unique=True, nullable=False)
+    # 定长摘要, 唯一索引更窄且库中不保存明文
+    token = db.Column(DatabaseCompat.digest_type(), unique=True, nullable=False)
+    is_signed = db.Column(DatabaseCompat.boolean_type(), default=False, nullable=False)  # 是否为签名令牌(撤销时需写入撤销列表)
+    # authorization_code = 用户授权的令牌; client_credentials = 应用级令牌(user_id为应用所有者)
+    grant_type = db.Column(DatabaseCompat.string_type(20), default='authorization_code', nullable=False)
     client_id = db.Column(DatabaseCompat.string_type(40), nullable=False)
     scope = db.Column(DatabaseCompat.text_type())
     expires_at = db.Column(DatabaseCompat.datetime_type(), nullable=False)
     user_id = db.Column(DatabaseCompat.integer_type(), db.ForeignKey('user.id'), nullable=False)
 
+    __table_args__ = (
+        # get_authorized_apps / 取消授权: user_id + client_id + expires_at
+        db.Index('ix_access_token_user_client_expires', 'user_id', 'client_id', 'expires_at'),
+        # 删除客户端时按client_id删除
+        db.Index('ix_access_token_client_id', 'client_id'),
+        # 过期清理
+        db.Index('ix_access_token_expires_at', 'expires_at'),
+    )
+
+
+# 刷新令牌模型 - 只保存摘要，每次使用后轮换
+class RefreshToken(db.Model):
+    id = db.Column(DatabaseCompat.integer_type(), primary_key=True)
+    token_hash = db.Column(DatabaseCompat.digest_type(), unique=True, nullable=False)  # 令牌的SHA-256摘要
+    client_id = db.Column(DatabaseCompat.string_type(40), nullable=False)
+    scope = db.Column(DatabaseCompat.text_type())
+    created_at = db.Column(DatabaseCompat.datetime_type(), default=get_utc_now)
+    expires_at = db.Column(DatabaseCompat.datetime_type(), nullable=False)
+    user_id = db.Column(DatabaseCompat.integer_type(), db.ForeignKey('user.id'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_refresh_token_user_client', 'user_id', 'client_id'),
+        db.Index('ix_refresh_token_client_id', 'client_id'),
+        db.Index('ix_refresh_token_expires_at', 'expires_at'),
+    )
+
+
+# 签名令牌撤销列表模型 - 只记录未过期的已撤销签名令牌
+class RevokedToken(db.Model):
+    id = db.Column(DatabaseCompat.integer_type(), primary_key=True)
+    token_hash = db.Column(DatabaseCompat.digest_type(), unique=True, nullable=False)  # 令牌的SHA-256摘要
+    expires_at = db.Column(DatabaseCompat.datetime_type(), nullable=False, index=True)
+
+
+def hash_token(value):
+    """计算令牌的SHA-256摘要（64位十六进制）"""
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
 class Plugins:
     def __init__(self, plugins_dir):
         self.dir = plugins_dir
@@ -587,6 +1501,432 @@ class Plugins:
         self.load_plugins()
 
 
+class CachedAccessToken:
+    """访问令牌的只读快照（属性名与AccessToken一致），可脱离数据库会话跨请求使用"""
+
+    __slots__ = ('token', 'client_id', 'scope', 'expires_at', 'user_id', 'grant_type', 'username', 'email',
+                 'has_avatar', 'client_name')
+
+    def __init__(self, token, username, email, has_avatar, client_name):
+        self.token = token.token
+        self.client_id = token.client_id
+        self.scope = token.scope
+        self.expires_at = token.expires_at
+        self.user_id = token.user_id
+        self.grant_type = token.grant_type
+        # userinfo所需的用户字段（不缓存头像本身）
+        self.username = username
+        self.email = email
+        self.has_avatar = bool(has_avatar)
+        self.client_name = client_name
+
+    @classmethod
+    def from_claims(cls, token, claims):
+        """由已验证的签名令牌声明构建快照（不含用户信息）"""
+        entry = cls.__new__(cls)
+        entry.token = token
+        entry.client_id = claims['client_id']
+        entry.scope = claims.get('scope')
+        entry.expires_at = datetime.fromtimestamp(claims['exp'], timezone.utc).replace(tzinfo=None)
+        entry.user_id = int(claims['sub'])
+        entry.grant_type = claims.get('gty', 'authorization_code')
+        entry.username = None
+        entry.email = None
+        entry.has_avatar = None
+        entry.client_name = None
+        return entry
+
+
+class TokenCache:
+    """进程内访问令牌缓存（LRU + TTL）"""
+
+    def __init__(self, max_size=10000, ttl=60):
+        self.max_size = int(max_size)
+        self.ttl = int(ttl)
+        self._entries = OrderedDict()  # token -> (缓存失效时间, CachedAccessToken)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        """获取缓存的令牌快照，未命中或已失效返回None"""
+        now = get_utc_now()
+        with self._lock:
+            item = self._entries.get(token)
+            if item is None:
+                self.misses += 1
+                return None
+
+            stale_at, entry = item
+            if stale_at <= now:
+                del self._entries[token]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry
+
+    def set(self, token, entry):
+        """缓存令牌快照，缓存时间不会超过令牌本身的过期时间"""
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+
+        stale_at = min(get_utc_now() + timedelta(seconds=self.ttl), entry.expires_at)
+        with self._lock:
+            self._entries[token] = (stale_at, entry)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token):
+        """使单个令牌失效"""
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def invalidate_where(self, user_id=None, client_id=None):
+        """按用户和/或客户端使令牌失效"""
+        with self._lock:
+            for token, (_, entry) in list(self._entries.items()):
+                if user_id is not None and entry.user_id != user_id:
+                    continue
+                if client_id is not None and entry.client_id != client_id:
+                    continue
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """命中率统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
+
+
+def parse_redirect_uris(redirect_uris):
+    """解析客户端的重定向URI（JSON格式，兼容旧的每行一个的格式）"""
+    try:
+        return json.loads(redirect_uris)
+    except json.JSONDecodeError:
+        return [uri.strip() for uri in redirect_uris.split('\n') if uri.strip()]
+
+
+class CachedClient:
+    """OAuth客户端的只读快照，重定向URI预先解析为不可变集合"""
+
+    __slots__ = ('id', 'client_id', 'client_secret', 'client_name', 'user_id', 'redirect_uris')
+
+    def __init__(self, client):
+        self.id = client.id
+        self.client_id = client.client_id
+        self.client_secret = client.client_secret
+        self.client_name = client.client_name
+        self.user_id = client.user_id
+        self.redirect_uris = frozenset(parse_redirect_uris(client.redirect_uris))
+
+    def check_secret(self, client_secret):
+        # compare_digest只接受ASCII字符串, 按字节比较以免非ASCII的密钥引发异常
+        return client_secret is not None and secrets.compare_digest(
+            self.client_secret.encode('utf-8'), client_secret.encode('utf-8'))
+
+
+class ClientRegistry:
+    """进程内OAuth客户端注册表，授权和令牌端点无需每次查询数据库"""
+
+    def __init__(self, ttl=60):
+        self.ttl = int(ttl)
+        self._clients = {}  # client_id -> (缓存失效时间, CachedClient)
+        self._lock = threading.Lock()
+
+    def get(self, client_id):
+        """获取客户端快照，不存在返回None"""
+        if not client_id:
+            return None
+
+        item = self._clients.get(client_id)
+        if item is not None and item[0] > get_utc_now():
+            return item[1]
+
+        client = OAuthClient.query.filter_by(client_id=client_id).first()
+        if not client:
+            self.remove(client_id)
+            return None
+        return self.refresh(client)
+
+    def refresh(self, client):
+        """客户端创建或修改后更新快照"""
+        entry = CachedClient(client)
+        with self._lock:
+            self._clients[client.client_id] = (get_utc_now() + timedelta(seconds=self.ttl), entry)
+        return entry
+
+    def remove(self, client_id):
+        """客户端删除后移除快照"""
+        with self._lock:
+            self._clients.pop(client_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+
+class TokenSigner:
+    """自包含访问令牌（JWT, EdDSA/Ed25519）的签发与本地校验"""
+
+    def __init__(self, seed):
+        self._private_key = Ed25519PrivateKey.from_private_bytes(seed)
+        self._public_key = self._private_key.public_key()
+        public_bytes = self._public_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+        self.public_key_b64 = self.b64encode(public_bytes)
+        self.key_id = self.b64encode(hashlib.sha256(public_bytes).digest()[:12])
+        self._header = self.b64encode(json.dumps(
+            {'alg': 'EdDSA', 'typ': 'at+jwt', 'kid': self.key_id}, separators=(',', ':')
+        ).encode('utf-8'))
+
+    @staticmethod
+    def b64encode(data):
+        return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+    @staticmethod
+    def b64decode(data):
+        return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+    @staticmethod
+    def is_signed(token):
+        """随机令牌(token_urlsafe)不含'.'，签名令牌固定为三段"""
+        return token.count('.') == 2
+
+    def issue(self, claims):
+        """签发令牌"""
+        payload = self.b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+        signing_input = f'{self._header}.{payload}'
+        signature = self._private_key.sign(signing_input.encode('ascii'))
+        return f'{signing_input}.{self.b64encode(signature)}'
+
+    def verify(self, token):
+        """校验签名并返回声明; 签名无效返回None（过期与否由调用方判断）"""
+        try:
+            header, payload, signature = token.split('.')
+            if header != self._header:
+                return None
+            self._public_key.verify(self.b64decode(signature), f'{header}.{payload}'.encode('ascii'))
+            return json.loads(self.b64decode(payload))
+        except (ValueError, InvalidSignature):
+            return None
+
+    def jwks(self):
+        """公钥(JWK Set), 供第三方服务本地校验令牌"""
+        return {
+            'keys': [{
+                'kty': 'OKP',
+                'crv': 'Ed25519',
+                'x': self.public_key_b64,
+                'kid': self.key_id,
+                'alg': 'EdDSA',
+                'use': 'sig'
+            }]
+        }
+
+
+class RevocationList:
+    """签名令牌撤销列表: 以RevokedToken表为准, 进程内保存定期刷新的副本"""
+
+    def __init__(self, refresh_interval=60):
+        self.refresh_interval = int(refresh_interval)
+        self._hashes = frozenset()
+        self._refresh_at = None
+        self._lock = threading.Lock()
+
+    def contains(self, token_hash):
+        now = get_utc_now()
+        if self._refresh_at is None or self._refresh_at <= now:
+            self.refresh()
+        return token_hash in self._hashes
+
+    def refresh(self):
+        """从数据库重新加载未过期的撤销记录"""
+        now = get_utc_now()
+        rows = db.session.query(RevokedToken.token_hash).filter(RevokedToken.expires_at > now).all()
+        with self._lock:
+            self._hashes = frozenset(row[0] for row in rows)
+            self._refresh_at = now + timedelta(seconds=self.refresh_interval)
+
+    def invalidate(self):
+        """下次校验时重新加载"""
+        self._refresh_at = None
+
+
+class ClientDataFeed:
+    """记录第三方存储数据的变更，并唤醒等待中的长轮询请求"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+
+    @staticmethod
+    def record(client_id, user_id, keys, op='upsert'):
+        """在当前事务中记录变更（由调用方提交）"""
+        now = get_utc_now()
+        rows = [{'client_id': client_id, 'user_id': user_id, 'data_key': key, 'op': op, 'created_at': now}
+                for key in keys]
+        if rows:
+            db.session.execute(ClientDataChange.__table__.insert(), rows)
+
+    @staticmethod
+    def record_deletes(*conditions):
+        """删除数据前，以一条 INSERT ... SELECT 为符合条件的行记录删除标记"""
+        table = ClientDataChange.__table__
+        db.session.execute(table.insert().from_select(
+            ['client_id', 'user_id', 'data_key', 'op', 'created_at'],
+            select(ClientUserData.client_id, ClientUserData.user_id, ClientUserData.data_key,
+                   literal('delete'), literal(get_utc_now())).where(*conditions)
+        ))
+
+    @staticmethod
+    def purge_client(client_id):
+        """删除应用时一并删除其变更记录"""
+        ClientDataChange.query.filter_by(client_id=client_id).delete(synchronize_session=False)
+
+    def notify(self):
+        """提交后唤醒本进程内等待的长轮询（其他进程的请求按轮询间隔发现变更）"""
+        with self._condition:
+            self._condition.notify_all()
+
+    def wait(self, timeout):
+        with self._condition:
+            self._condition.wait(timeout)
+
+
+class ExpiredDataSweeper:
+    """分批删除过期的令牌、授权码、验证码和第三方存储数据，避免表和唯一索引无限增长"""
+
+    def __init__(self, batch_size=1000, interval=0, code_retention_days=30, change_retention_days=7):
+        self.batch_size = max(int(batch_size), 1)
+        self.interval = int(interval)
+        self.code_retention_days = int(code_retention_days)
+        self.change_retention_days = int(change_retention_days)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.running = False
+        self.progress = {}  # 当前运行中各表已删除的行数
+        self.current_table = None
+        self.last_run = None
+        self.total_deleted = 0
+
+    def targets(self, now):
+        """(名称, 模型, 删除条件)"""
+        code_cutoff = now - timedelta(days=self.code_retention_days)
+        change_cutoff = now - timedelta(days=self.change_retention_days)
+        return [
+            ('access_token', AccessToken, AccessToken.expires_at < now),
+            ('refresh_token', RefreshToken, RefreshToken.expires_at < now),
+            ('revoked_token', RevokedToken, RevokedToken.expires_at < now),
+            ('authorization_code', AuthorizationCode, AuthorizationCode.expires_at < code_cutoff),
+            ('email_verification_code', EmailVerificationCode,
+             db.or_(EmailVerificationCode.used == True, EmailVerificationCode.expires_at < now)),
+            ('client_data_change', ClientDataChange, ClientDataChange.created_at < change_cutoff),
+            ('client_user_data', ClientUserData, ClientUserData.expires_at < now),
+            ('client_data_blob', ClientDataBlob, ClientDataBlob.ref_count <= 0),
+        ]
+
+    @staticmethod
+    def before_delete(model, *conditions):
+        """删除一批行之前的附带处理: 过期的第三方存储数据需要记录删除变更、扣减用量并释放值块引用"""
+        if model is ClientUserData:
+            ClientDataFeed.record_deletes(*conditions)
+            ClientDataQuota.apply_deletes(*conditions)
+            ClientDataBlobStore.release(*conditions)
+
+    def sweep_table(self, name, model, condition):
+        """按主键分批删除，每批单独提交，避免长事务和大范围锁"""
+        deleted = 0
+        while True:
+            # MySQL下锁定选出的行，删除前的附带处理与删除看到的是同一批数据
+            ids = [row[0] for row in db.session.query(model.id).filter(condition)
+                   .limit(self.batch_size).with_for_update().all()]
+            if not ids:
+                break
+
+            # 选出后到删除前行可能被修改（如过期的键被重新写入），附带处理和删除都重新检查条件；
+            # 附带处理的第一条写语句起即持有写锁（SQLite）或行锁（MySQL），之后的语句看到的是同一批行
+            batch = (model.id.in_(ids), condition)
+            self.before_delete(model, *batch)
+            deleted += model.query.filter(*batch).delete(synchronize_session=False)
+            db.session.commit()
+
+            self.progress[name] = deleted
+            if len(ids) < self.batch_size:
+                break
+        return deleted
+
+    def run_once(self):
+        """执行一轮清理，返回本轮统计；已有清理在运行时返回None"""
+        if not self._lock.acquire(blocking=False):
+            return None
+
+        started_at = get_utc_now()
+        self.running = True
+        self.progress = {}
+        error = None
+        try:
+            for name, model, condition in self.targets(started_at):
+                self.current_table = name
+                self.progress[name] = 0
+                self.sweep_table(name, model, condition)
+        except Exception as e:
+            db.session.rollback()
+            error = str(e)
+            print(f"清理过期数据时出错: {error}")
+        finally:
+            self.current_table = None
+            self.running = False
+            deleted = sum(self.progress.values())
+            self.total_deleted += deleted
+            self.last_run = {
+                'started_at': started_at.isoformat(),
+                'finished_at': get_utc_now().isoformat(),
+                'deleted': dict(self.progress),
+                'deleted_total': deleted,
+                'error': error
+            }
+            self._lock.release()
+        return self.last_run
+
+    def start(self):
+        """启动后台清理线程"""
+        if self.interval <= 0 or self._thread is not None:
+            return
+
+        def loop():
+            while True:
+                with app.app_context():
+                    self.run_once()
+                time.sleep(self.interval)
+
+        self._thread = threading.Thread(target=loop, name='expired-data-sweeper', daemon=True)
+        self._thread.start()
+
+    def stats(self):
+        return {
+            'running': self.running,
+            'current_table': self.current_table,
+            'progress': dict(self.progress),
+            'interval': self.interval,
+            'batch_size': self.batch_size,
+            'thread_alive': self._thread is not None and self._thread.is_alive(),
+            'last_run': self.last_run,
+            'total_deleted': self.total_deleted
+        }
+
+
 # 创建数据库表（在app_context内）和管理员账户
 with app.app_context():
     create_admin_user()
@@ -599,8 +1939,36 @@ with app.app_context():
 
     MAX_CLIENTS_PER_USER = config_manager.get("max_clients_per_user", default=-1)
     TOKEN_EXPIRE_DAYS = config_manager.get("token_expire_days", default=30)
+    TOKEN_EXPIRE_MINUTES = config_manager.get("token_expire_minutes", default=0)
+    REFRESH_TOKEN_EXPIRE_DAYS = config_manager.get("refresh_token_expire_days", default=30)
 
     ALLOW_REGISTRATION = config_manager.get("allow_registration", default=True)
+    ClientDataCodec.compress_threshold = config_manager.get("client_data_compress_threshold", default=4096)
+    ClientDataBlobStore.threshold = config_manager.get("client_data_dedup_threshold", default=0)
+    ClientDataQuota.limits = {
+        name: config_manager.get(f"client_data_max_{name}", default=0)
+        for name in ('rows_per_user', 'bytes_per_user', 'rows_per_client', 'bytes_per_client')
+    }
+
+    token_cache = TokenCache(max_size=config_manager.get("token_cache_size", default=10000),
+                             ttl=config_manager.get("token_cache_ttl", default=60))
+
+    ACCESS_TOKEN_FORMAT = config_manager.get("access_token_format", default="opaque")
+    # 注意: 未设置SECRET_KEY和TOKEN_SIGNING_KEY时, 重启后已签发的签名令牌将全部失效
+    token_signer = TokenSigner(
+        TokenSigner.b64decode(TOKEN_SIGNING_KEY) if TOKEN_SIGNING_KEY
+        else hashlib.sha256(f"access-token-signing:{app.config['SECRET_KEY']}".encode('utf-8')).digest()
+    )
+    revocation_list = RevocationList(refresh_interval=config_manager.get("token_cache_ttl", default=60))
+    client_registry = ClientRegistry(ttl=config_manager.get("token_cache_ttl", default=60))
+
+    sweeper = ExpiredDataSweeper(
+        batch_size=config_manager.get("sweeper_batch_size", default=1000),
+        interval=config_manager.get("sweeper_interval", default=0),
+        code_retention_days=config_manager.get("authorization_code_retention_days", default=30),
+        change_retention_days=config_manager.get("client_data_change_retention_days", default=7)
+    )
+    change_feed = ClientDataFeed()
     app.jinja_env.globals.update(SITE_NAME=SITE_NAME, SITE_DESCRIPTION=SITE_DESCRIPTION, SITE_KEYWORDS=SITE_KEYWORDS,
                                  ALLOW_REGISTRATION=ALLOW_REGISTRATION, _MAIN_GLOBALS=globals())
 
@@ -609,29 +1977,88 @@ with app.app_context():
 
     app.jinja_env.globals.update(PLUGINS_MANAGER=plugin_manager)
 
+def get_access_token(access_token):
+    """查找访问令牌快照（优先命中缓存），令牌不存在返回None; 过期与否由调用方判断"""
+    token_hash = hash_token(access_token)
+
+    if TokenSigner.is_signed(access_token):
+        # 签名令牌本地校验，只需检查撤销列表
+        claims = token_signer.verify(access_token)
+        if not claims or revocation_list.contains(token_hash):
+            return None
+        return CachedAccessToken.from_claims(token_hash, claims)
+
+    entry = token_cache.get(token_hash)
+    if entry is not None:
+        return entry
+
+    return load_access_tokens([token_hash]).get(token_hash)
+
+def load_access_tokens(token_hashes):
+    """按摘要批量从数据库加载随机令牌快照并写入缓存, 返回 {摘要: 快照}"""
+    if not token_hashes:
+        return {}
+
+    # 一次联表查询同时取出令牌、用户和客户端（客户端已删除的令牌视为无效）
+    rows = db.session.query(
+        AccessToken,
+        User.username,
+        User.email,
+        User.avatar.isnot(None),
+        OAuthClient.client_name
+    ).join(
+        User, User.id == AccessToken.user_id
+    ).join(
+        OAuthClient, OAuthClient.client_id == AccessToken.client_id
+    ).filter(
+        AccessToken.token.in_(token_hashes)
+    ).all()
+
+    now = get_utc_now()
+    entries = {}
+    for row in rows:
+        entry = CachedAccessToken(*row)
+        if entry.expires_at >= now:
+            token_cache.set(entry.token, entry)
+        entries[entry.token] = entry
+    return entries
+
+def resolve_bearer_token(allow_client_token=False):
+    """
+    解析Authorization头中的Bearer令牌, 返回 (令牌快照, 错误响应)
+    应用级令牌(client_credentials)不代表任何用户, 默认不允许访问用户数据
+    """
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None, (jsonify(error='invalid_token', error_description='无效的访问令牌'), 401)
+
+    access_token = auth_header[7:]  # 去掉'Bearer '前缀
+
+    # 验证访问令牌
+    token = get_access_token(access_token)
+    if not token:
+        return None, (jsonify(error='invalid_token', error_description='无效的访问令牌'), 401)
+
+    if token.expires_at < get_utc_now():
+        return None, (jsonify(error='invalid_token', error_description='访问令牌已过期'), 401)
+
+    if token.grant_type == 'client_credentials' and not allow_client_token:
+        return None, (jsonify(error='invalid_token', error_description='应用级令牌不能访问用户数据'), 401)
+
+    return token, None
+
 def token_required(f):
     """OAuth令牌认证装饰器"""
 
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        # 从Authorization头获取访问令牌
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify(error='invalid_token', error_description='无效的访问令牌'), 401
-
-        access_token = auth_header[7:]  # 去掉'Bearer '前缀
+        token, error_response = resolve_bearer_token()
+        if error_response:
+            return error_response
 
-        # 验证访问令牌
-        token = AccessToken.query.filter_by(token=access_token).first()
-        if not token:
-            return jsonify(error='invalid_token', error_description='无效的访问令牌'), 401
-
-        if token.expires_at < get_utc_now():
-            return jsonify(error='invalid_token', error_description='访问令牌已过期'), 401
-
-        # 将令牌和用户信息添加到请求上下文中
+        # 将令牌和用户信息添加到请求上下文中（用户对象在首次访问时才查询）
         g.access_token = token
-        g.current_user = User.query.get(token.user_id)
+        g.current_user = LocalProxy(lambda: User.query.get(token.user_id))
 
         return f(*args, **kwargs)
 
@@ -650,10 +2077,10 @@ def token_required_or_optional(optional=False):
                 access_token = auth_header[7:]
 
                 # 验证访问令牌
-                token = AccessToken.query.filter_by(token=access_token).first()
-                if token and token.expires_at >= get_utc_now():
+                token = get_access_token(access_token)
+                if token and token.expires_at >= get_utc_now() and token.grant_type != 'client_credentials':
                     g.access_token = token
-                    g.current_user = User.query.get(token.user_id)
+                    g.current_user = LocalProxy(lambda: User.query.get(token.user_id))
                     g.has_valid_token = True
                 else:
                     g.has_valid_token = False
@@ -670,6 +2097,49 @@ def token_required_or_optional(optional=False):
 
     return decorator
 
+def client_owner_required(f):
+    """
+    应用所有者级接口认证装饰器（路由参数需包含client_id）
+    支持应用所有者的登录会话，或该应用通过client_credentials获取的应用级令牌
+    """
+
+    @wraps(f)
+    def decorated_function(client_id, *args, **kwargs):
+        if request.headers.get('Authorization', '').startswith('Bearer '):
+            token, error_response = resolve_bearer_token(allow_client_token=True)
+            if error_response:
+                return error_response
+
+            if token.grant_type != 'client_credentials' or token.client_id != client_id:
+                return jsonify(error='insufficient_scope', error_description='需要该应用的应用级令牌'), 403
+
+            g.access_token = token
+        else:
+            if not current_user.is_authenticated:
+                return login_manager.unauthorized()
+
+            # 验证客户端是否属于当前用户
+            client = client_registry.get(client_id)
+            if not client or client.user_id != current_user.id:
+                return jsonify(error='客户端不存在或无权访问'), 404
+
+        return f(client_id, *args, **kwargs)
+
+    return decorated_function
+
+def revoke_signed_tokens(query):
+    """将AccessToken查询命中的未过期签名令牌加入撤销列表（需在删除这些记录前调用，并由调用方提交）"""
+    rows = query.filter(
+        AccessToken.expires_at > get_utc_now(),
+        AccessToken.is_signed == True
+    ).with_entities(AccessToken.token, AccessToken.expires_at).all()
+
+    for token_hash, expires_at in rows:
+        if not RevokedToken.query.filter_by(token_hash=token_hash).first():
+            db.session.add(RevokedToken(token_hash=token_hash, expires_at=expires_at))
+
+    return len(rows)
+
 # 发送邮件函数
 def send_verification_email(email, verification_code):
     """发送验证码邮件"""
@@ -920,17 +2390,22 @@ def logout():
 def oauth_clients():
     clients = OAuthClient.query.filter_by(user_id=current_user.id).all()
 
+    # 数据用量（应用合计行，一次查询）
+    usage_rows = ClientDataUsage.query.filter(
+        ClientDataUsage.client_id.in_([client.client_id for client in clients]),
+        ClientDataUsage.user_id == 0
+    ).all() if clients else []
+    usage = {row.client_id: row for row in usage_rows}
+
     # 解析每个客户端的重定向URI
     for client in clients:
-        try:
-            # 尝试解析JSON格式的URI
-            client.redirect_uris_parsed = json.loads(client.redirect_uris)
-        except json.JSONDecodeError:
-            # 如果解析失败，使用原始格式（每行一个）
-            client.redirect_uris_parsed = [uri.strip() for uri in client.redirect_uris.split('\n') if uri.strip()]
+        client.redirect_uris_parsed = parse_redirect_uris(client.redirect_uris)
+        row = usage.get(client.client_id)
+        client.data_usage = {'rows': row.row_count if row else 0, 'bytes': row.byte_count if row else 0}
 
     # 修复：添加user=current_user参数
-    return render_template('clients.html', clients=clients, user=current_user)
+    return render_template('clients.html', clients=clients, user=current_user,
+                           data_limits=ClientDataQuota.limits)
 
 
 @app.route('/oauth/clients/create', methods=['GET', 'POST'])
@@ -965,6 +2440,7 @@ def create_oauth_client():
 
         db.session.add(client)
         db.session.commit()
+        client_registry.refresh(client)
 
         flash(f'OAuth客户端创建成功！客户端ID: {client_id}', 'success')
         return redirect(url_for('oauth_clients'))
@@ -984,24 +2460,16 @@ def oauth_authorize():
     scope = request.args.get('scope', '')
     state = request.args.get('state')
 
-    # 验证客户端是否存在
-    client = OAuthClient.query.filter_by(client_id=client_id).first()
+    # 验证客户端是否存在（从客户端注册表获取，重定向URI已预先解析）
+    client = client_registry.get(client_id)
     if not client:
         return jsonify(error='invalid_client', error_description='无效的客户端'), 400
 
     # 🔧 修改：不再验证客户端所有者，允许任何用户授权给任何客户端
     # 这是标准OAuth行为：客户端开发者创建应用，其他用户可以使用它
 
-    # 修复：处理重定向URI的解析
-    try:
-        # 首先尝试解析为JSON（新格式）
-        allowed_uris = json.loads(client.redirect_uris)
-    except json.JSONDecodeError:
-        # 如果JSON解析失败，假设是旧格式（每行一个URI）
-        allowed_uris = [uri.strip() for uri in client.redirect_uris.split('\n') if uri.strip()]
-
     # 验证重定向URI
-    if redirect_uri not in allowed_uris:
+    if redirect_uri not in client.redirect_uris:
         return jsonify(error='invalid_redirect_uri', error_description='无效的重定向URI'), 400
 
     # 验证响应类型
@@ -1016,7 +2484,7 @@ def oauth_authorize():
             expires_at = get_utc_now() + timedelta(minutes=10)
 
             authorization_code = AuthorizationCode(
-                code=code,
+                code=hash_token(code),  # 只保存摘要
                 client_id=client_id,
                 redirect_uri=redirect_uri,
                 scope=scope,
@@ -1047,6 +2515,66 @@ def oauth_authorize():
                            user=current_user)
 
 
+def get_access_token_lifetime():
+    """访问令牌有效期"""
+    if TOKEN_EXPIRE_MINUTES > 0:
+        return timedelta(minutes=TOKEN_EXPIRE_MINUTES)
+    return timedelta(days=TOKEN_EXPIRE_DAYS)
+
+
+def issue_access_token(client_id, user_id, scope, grant_type='authorization_code', lifetime=None):
+    """生成访问令牌并加入会话（由调用方提交），返回 (令牌, 过期时间)"""
+    expires_at = get_utc_now().replace(microsecond=0) + (lifetime or get_access_token_lifetime())
+
+    is_signed = ACCESS_TOKEN_FORMAT == 'jwt'
+    if is_signed:
+        access_token = token_signer.issue({
+            'sub': str(user_id),
+            'client_id': client_id,
+            'scope': scope,
+            'exp': int(expires_at.replace(tzinfo=timezone.utc).timestamp()),
+            'iat': int(get_utc_now().replace(tzinfo=timezone.utc).timestamp()),
+            'jti': secrets.token_urlsafe(16),
+            'gty': grant_type
+        })
+    else:
+        access_token = secrets.token_urlsafe(40)
+
+    # 库中只保存摘要
+    db.session.add(AccessToken(
+        token=hash_token(access_token),
+        is_signed=is_signed,
+        grant_type=grant_type,
+        client_id=client_id,
+        scope=scope,
+        expires_at=expires_at,
+        user_id=user_id
+    ))
+    return access_token, expires_at
+
+
+def issue_tokens(client_id, user_id, scope):
+    """生成访问令牌和刷新令牌（由调用方提交），返回令牌端点响应"""
+    access_token, _ = issue_access_token(client_id, user_id, scope)
+
+    refresh_token = secrets.token_urlsafe(40)
+    db.session.add(RefreshToken(
+        token_hash=hash_token(refresh_token),
+        client_id=client_id,
+        scope=scope,
+        expires_at=get_utc_now() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+        user_id=user_id
+    ))
+
+    return {
+        'access_token': access_token,
+        'token_type': 'Bearer',
+        'expires_in': int(get_access_token_lifetime().total_seconds()),
+        'refresh_token': refresh_token,
+        'scope': scope
+    }
+
+
 # OAuth令牌端点
 @app.route('/oauth/token', methods=['POST'])
 def oauth_token():
@@ -1055,16 +2583,17 @@ def oauth_token():
     client_secret = request.form.get('client_secret')
     code = request.form.get('code')
     redirect_uri = request.form.get('redirect_uri')
+    refresh_token = request.form.get('refresh_token')
 
     # 验证客户端凭证
-    client = OAuthClient.query.filter_by(client_id=client_id).first()
-    if not client or client.client_secret != client_secret:
+    client = client_registry.get(client_id)
+    if not client or not client.check_secret(client_secret):
         return jsonify(error='invalid_client', error_description='无效的客户端凭证'), 401
 
     if grant_type == 'authorization_code':
         # 验证授权码
         auth_code = AuthorizationCode.query.filter_by(
-            code=code,
+            code=hash_token(code or ''),
             client_id=client_id,
             used=False
         ).first()
@@ -1084,63 +2613,205 @@ def oauth_token():
         # 标记授权码为已使用
         auth_code.used = True
 
-        # 生成访问令牌
-        access_token = secrets.token_urlsafe(40)
-        refresh_token = secrets.token_urlsafe(40)
-        expires_at = get_utc_now() + timedelta(days=TOKEN_EXPIRE_DAYS)
+        # 生成访问令牌和刷新令牌
+        response = issue_tokens(client_id, auth_code.user_id, auth_code.scope)
+        db.session.commit()
 
-        token = AccessToken(
-            token=access_token,
-            client_id=client_id,
-            scope=auth_code.scope,
-            expires_at=expires_at,
-            user_id=auth_code.user_id  # 使用授权码对应的用户ID
-        )
+        return jsonify(response)
+
+    if grant_type == 'refresh_token':
+        # 验证刷新令牌
+        stored_refresh_token = RefreshToken.query.filter_by(
+            token_hash=hash_token(refresh_token or ''),
+            client_id=client_id
+        ).first()
+
+        if not stored_refresh_token:
+            return jsonify(error='invalid_grant', error_description='无效的刷新令牌'), 400
+
+        if stored_refresh_token.expires_at < get_utc_now():
+            db.session.delete(stored_refresh_token)
+            db.session.commit()
+            return jsonify(error='invalid_grant', error_description='刷新令牌已过期'), 400
 
-        db.session.add(token)
+        # 轮换：旧刷新令牌立即作废；以条件DELETE的影响行数判断，并发使用同一刷新令牌时只有一个请求成功
+        deleted = RefreshToken.query.filter_by(
+            id=stored_refresh_token.id,
+            token_hash=stored_refresh_token.token_hash,
+            client_id=client_id
+        ).delete(synchronize_session=False)
+        if deleted != 1:
+            db.session.rollback()
+            return jsonify(error='invalid_grant', error_description='无效的刷新令牌'), 400
+
+        # 已删除的对象移出会话，新签发的刷新令牌可能复用其主键
+        user_id, scope = stored_refresh_token.user_id, stored_refresh_token.scope
+        db.session.expunge(stored_refresh_token)
+        response = issue_tokens(client_id, user_id, scope)
+        db.session.commit()
+
+        return jsonify(response)
+
+    if grant_type == 'client_credentials':
+        # 应用级令牌: 供服务端任务访问应用所有者级接口, 不签发刷新令牌
+        scope = request.form.get('scope', '')
+        lifetime = timedelta(days=TOKEN_EXPIRE_DAYS)
+        access_token, _ = issue_access_token(client_id, client.user_id, scope,
+                                             grant_type='client_credentials', lifetime=lifetime)
         db.session.commit()
 
         return jsonify({
             'access_token': access_token,
             'token_type': 'Bearer',
-            'expires_in': TOKEN_EXPIRE_DAYS * 24 * 3600,  # 过期时间(day)
-            'refresh_token': refresh_token,
-            'scope': auth_code.scope
+            'expires_in': int(lifetime.total_seconds()),
+            'scope': scope
         })
 
-    return jsonify(error='unsupported_grant_type', error_description='不支持的授权类型'), 400
+    return jsonify(error='unsupported_grant_type', error_description='不支持的授权类型'), 400
+
+
+# 条件请求（ETag / If-None-Match）
+def compute_etag(*parts):
+    """由决定响应内容的各部分计算强ETag"""
+    raw = json.dumps(parts, default=str, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def not_modified_response(etag):
+    """If-None-Match命中时返回304响应，否则返回None"""
+    if not request.if_none_match.contains(etag):
+        return None
+
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def with_etag(response, etag):
+    """为响应设置ETag，客户端每次使用前需重新验证"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 
 # OAuth用户信息端点
 @app.route('/oauth/userinfo')
+@token_required
 def oauth_userinfo():
-    # 从Authorization头获取访问令牌
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return jsonify(error='invalid_token', error_description='无效的访问令牌'), 401
-
-    access_token = auth_header[7:]  # 去掉'Bearer '前缀
-
-    # 验证访问令牌
-    token = AccessToken.query.filter_by(token=access_token).first()
-    if not token:
-        return jsonify(error='invalid_token', error_description='无效的访问令牌'), 401
+    # 令牌快照中已包含所需的用户信息，无需再查询用户表
+    token = g.access_token
 
-    if token.expires_at < get_utc_now():
-        return jsonify(error='invalid_token', error_description='访问令牌已过期'), 401
+    if token.username is None:
+        # 签名令牌只携带用户ID
+        user = User.query.get(token.user_id)
+        if not user:
+            return jsonify(error='invalid_token', error_description='无效的访问令牌'), 401
+        username, email, has_avatar = user.username, user.email, user.avatar is not None
+    else:
+        username, email, has_avatar = token.username, token.email, token.has_avatar
 
-    # 获取用户信息
-    user = User.query.get(token.user_id)
+    etag = compute_etag('userinfo', token.user_id, username, email, has_avatar)
+    response = not_modified_response(etag)
+    if response:
+        return response
 
     # 返回用户信息（移除头像数据）
     user_info = {
-        'sub': str(user.id),
-        'username': user.username,
-        'email': user.email,
-        'has_avatar': user.avatar is not None  # 只返回是否有头像的标识
+        'sub': str(token.user_id),
+        'username': username,
+        'email': email,
+        'has_avatar': has_avatar  # 只返回是否有头像的标识
     }
 
-    return jsonify(user_info)
+    return with_etag(jsonify(user_info), etag)
+
+
+# 令牌内省端点 (RFC 7662)
+INTROSPECT_MAX_TOKENS = 500
+
+@app.route('/oauth/introspect', methods=['POST'])
+def oauth_introspect():
+    """
+    校验令牌状态, 支持批量
+    客户端凭证可通过HTTP Basic或表单client_id/client_secret提供; 只能内省签发给自己的令牌
+    单个令牌: 表单token=...; 批量: JSON {"tokens": [...]}, 按请求顺序返回 {"results": [...]}
+    """
+    if request.authorization and request.authorization.type == 'basic':
+        client_id = request.authorization.username
+        client_secret = request.authorization.password
+    else:
+        client_id = request.form.get('client_id')
+        client_secret = request.form.get('client_secret')
+
+    client = client_registry.get(client_id)
+    if not client or not client.check_secret(client_secret):
+        return jsonify(error='invalid_client', error_description='无效的客户端凭证'), 401
+
+    data = request.get_json(silent=True) if request.is_json else None
+    batch = data is not None
+    if batch:
+        if not isinstance(data, dict):
+            return jsonify(error='invalid_request', error_description='请求体必须是JSON对象'), 400
+        tokens = data.get('tokens')
+        if not isinstance(tokens, list) or not all(isinstance(token, str) for token in tokens):
+            return jsonify(error='invalid_request', error_description='tokens 必须是字符串数组'), 400
+    else:
+        tokens = [request.form.get('token', '')]
+
+    if len(tokens) > INTROSPECT_MAX_TOKENS:
+        return jsonify(error='invalid_request',
+                       error_description=f'单次最多内省{INTROSPECT_MAX_TOKENS}个令牌'), 400
+
+    # 签名令牌本地校验; 随机令牌先查缓存, 未命中的一次IN查询加载
+    entries = {}
+    missing = []
+    for token in set(tokens):
+        if not token:
+            continue
+        token_hash = hash_token(token)
+        if TokenSigner.is_signed(token):
+            entries[token_hash] = get_access_token(token)
+        else:
+            entry = token_cache.get(token_hash)
+            if entry is None:
+                missing.append(token_hash)
+            entries[token_hash] = entry
+    entries.update(load_access_tokens(missing))
+
+    now = get_utc_now()
+    max_age = token_cache.ttl
+    results = []
+    for token in tokens:
+        entry = entries.get(hash_token(token)) if token else None
+        if not entry or entry.expires_at < now or entry.client_id != client.client_id:
+            results.append({'active': False})
+            continue
+
+        max_age = min(max_age, int((entry.expires_at - now).total_seconds()))
+        results.append({
+            'active': True,
+            'scope': entry.scope,
+            'client_id': entry.client_id,
+            'sub': str(entry.user_id),
+            'exp': int(entry.expires_at.replace(tzinfo=timezone.utc).timestamp()),
+            'token_type': 'Bearer'
+        })
+
+    response = jsonify({'results': results} if batch else results[0])
+    # 结果可在令牌缓存有效期内复用（撤销最多延迟同样的时间生效）
+    response.headers['Cache-Control'] = f'private, max-age={max(max_age, 0)}'
+    response.headers['Vary'] = 'Authorization'
+    return response
+
+
+# 签名令牌公钥端点
+@app.route('/oauth/jwks')
+def oauth_jwks():
+    """返回签名访问令牌的公钥(JWK Set)，第三方服务可据此本地校验令牌"""
+    response = jsonify(token_signer.jwks())
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    return response
 
 
 @app.route('/oauth/clients/<int:client_id>/delete', methods=['POST'])
@@ -1155,11 +2826,16 @@ def delete_oauth_client(client_id):
     try:
         # 删除相关的授权码和访问令牌
         AuthorizationCode.query.filter_by(client_id=client.client_id).delete()
+        revoke_signed_tokens(AccessToken.query.filter_by(client_id=client.client_id))
         AccessToken.query.filter_by(client_id=client.client_id).delete()
+        RefreshToken.query.filter_by(client_id=client.client_id).delete()
 
         # 删除客户端
         db.session.delete(client)
         db.session.commit()
+        token_cache.invalidate_where(client_id=client.client_id)
+        revocation_list.invalidate()
+        client_registry.remove(client.client_id)
 
         flash('客户端删除成功!', 'success')
     except Exception as e:
@@ -1175,92 +2851,613 @@ def oauth_revoke():
     token = request.form.get('token')
     token_type_hint = request.form.get('token_type_hint', 'access_token')
 
-    if token_type_hint == 'access_token':
-        access_token = AccessToken.query.filter_by(token=token).first()
-        if access_token:
-            db.session.delete(access_token)
+    if token_type_hint == 'access_token' and token:
+        token_hash = hash_token(token)
+        access_tokens = AccessToken.query.filter_by(token=token_hash)
+        # 签名令牌同时加入撤销列表
+        signed_count = revoke_signed_tokens(access_tokens)
+        if access_tokens.delete():
             db.session.commit()
-    # 可以扩展支持撤销刷新令牌
+        token_cache.invalidate(token_hash)
+        if signed_count:
+            revocation_list.invalidate()
+    elif token_type_hint == 'refresh_token' and token:
+        RefreshToken.query.filter_by(token_hash=hash_token(token)).delete()
+        db.session.commit()
 
     return jsonify({'status': 'success'})
 
 
 # 存储第三方网站数据的端点
+CLIENT_DATA_BATCH_MAX = 500
+CLIENT_DATA_TTL_MAX = 365 * 24 * 3600
+
+
+def validate_client_data_item(item):
+    """校验单条写入项, 返回错误描述或None"""
+    if not isinstance(item, dict) or 'key' not in item:
+        return '缺少数据键名'
+
+    key = item['key']
+    if not isinstance(key, str) or not key:
+        return '数据键名必须为非空字符串'
+    if len(key) > 200:
+        return '数据键名不能超过200个字符'
+
+    expected_version = item.get('expected_version')
+    if expected_version is not None and (
+            not isinstance(expected_version, int) or isinstance(expected_version, bool) or expected_version < 0):
+        return 'expected_version必须为非负整数'
+
+    ttl = item.get('ttl')
+    if ttl is not None and (
+            not isinstance(ttl, int) or isinstance(ttl, bool) or not 0 < ttl <= CLIENT_DATA_TTL_MAX):
+        return f'ttl必须为1到{CLIENT_DATA_TTL_MAX}之间的整数（秒）'
+
+    return None
+
+
+def build_client_data_row(token, item, now):
+    """将写入项转换为待写入的列"""
+    return {
+        'client_id': token.client_id,
+        'user_id': token.user_id,  # 🔧 使用令牌中的用户ID，不是客户端所有者ID
+        'data_key': item['key'],
+        **ClientDataCodec.encode(item.get('value')),
+        'data_type': item.get('type', 'string'),
+        'blob_id': None,
+        # 不带ttl的写入会清除原有的过期时间
+        'expires_at': now + timedelta(seconds=item['ttl']) if item.get('ttl') else None,
+        'created_at': now,
+        'updated_at': now
+    }
+
+
+def client_data_alive(now=None):
+    """未过期的数据（过期的行在读取时视为不存在，由后台清理删除）"""
+    return or_(ClientUserData.expires_at.is_(None), ClientUserData.expires_at > (now or get_utc_now()))
+
+
+def expire_client_data_keys(client_id, user_id, keys, now):
+    """删除指定键中已过期的行（条件写入前调用，使过期的键按不存在处理）"""
+    expired = [row.id for row in db.session.query(ClientUserData.id).filter(
+        ClientUserData.client_id == client_id,
+        ClientUserData.user_id == user_id,
+        ClientUserData.data_key.in_(keys),
+        ClientUserData.expires_at <= now
+    ).all()]
+    if not expired:
+        return
+
+    # 重新检查过期时间: 选出后行可能已被并发写入覆盖（同一ID, 过期时间被清除）
+    conditions = (ClientUserData.id.in_(expired), ClientUserData.expires_at <= now)
+    ClientDataFeed.record_deletes(*conditions)
+    ClientDataQuota.apply_deletes(*conditions)
+    ClientDataBlobStore.release(*conditions)
+    ClientUserData.query.filter(*conditions).delete(synchronize_session=False)
+
+
+def swap_client_data(row, expected_version, row_id=None):
+    """
+    条件写入（比较并交换），单条语句完成，返回新版本号；前置条件不满足时返回None
+    expected_version为0表示只在键不存在时创建，为None表示只要键存在即写入（If-Match: *）；
+    row_id来自If-Match，用于区分删除后重建的同名键
+    """
+    table = ClientUserData.__table__
+    if expected_version == 0:
+        result = db.session.execute(DatabaseCompat.insert_ignore(ClientUserData, [dict(row, version=1)]))
+        if not result.rowcount:
+            return None
+
+        ClientDataFeed.record(row['client_id'], row['user_id'], [row['data_key']])
+        return 1
+
+    conditions = [
+        table.c.client_id == row['client_id'],
+        table.c.user_id == row['user_id'],
+        table.c.data_key == row['data_key']
+    ]
+    if expected_version is not None:
+        conditions.append(table.c.version == expected_version)
+    if row_id is not None:
+        conditions.append(table.c.id == row_id)
+
+    values = {column: value for column, value in row.items()
+              if column not in ('client_id', 'user_id', 'data_key', 'created_at')}
+    result = db.session.execute(table.update().where(*conditions).values(**values, version=table.c.version + 1))
+    if not result.rowcount:
+        return None
+
+    ClientDataFeed.record(row['client_id'], row['user_id'], [row['data_key']])
+    if expected_version is None:
+        # 未比较版本，读取写入后的版本号（本事务已持有该行的写锁）
+        return db.session.execute(select(table.c.version).where(*conditions)).scalar()
+    return expected_version + 1
+
+
+def client_data_size_delta(sizes, written):
+    """按写入顺序计算用量变化 (新增条数, 字节数变化)，sizes为写入前各键的字节数（会被更新）"""
+    delta_rows = delta_bytes = 0
+    for row in written:
+        previous = sizes.get(row['data_key'])
+        sizes[row['data_key']] = row['data_size']
+        delta_rows += 1 if previous is None else 0
+        delta_bytes += row['data_size'] - (previous or 0)
+    return delta_rows, delta_bytes
+
+
+def write_client_data_items(token, items):
+    """
+    在同一事务中写入多条数据（由调用方提交），返回 (与items顺序一致的逐条结果, 错误响应)
+    无前置条件的项合并为一条原生upsert语句；带expected_version的项逐条以条件UPDATE写入
+    用量计数在同一事务中更新；写入后将超出配额时整体拒绝
+    """
+    results = []
+    rows = {}
+    conditional = []
+    now = get_utc_now()
+    for item in items:
+        error = validate_client_data_item(item)
+        if error:
+            results.append({'key': item.get('key') if isinstance(item, dict) else None,
+                            'status': 'error', 'error_description': error})
+            continue
+
+        key = item['key']
+        row = build_client_data_row(token, item, now)
+        if item.get('expected_version') is not None or item.get('must_exist'):
+            conditional.append((len(results), row, item))
+        else:
+            # 同一批次中重复的键以最后一项为准
+            rows.pop(key, None)
+            rows[key] = row
+        results.append({'key': key, 'status': 'stored'})
+
+    # 无条件写入直接覆盖过期的行；条件写入需要先删除过期的行，避免与已过期的版本比较
+    if conditional:
+        expire_client_data_keys(token.client_id, token.user_id, {row['data_key'] for _, row, _ in conditional}, now)
+
+    # 按执行顺序（先upsert再条件写入）计算用量变化，假定条件写入全部成功来检查配额
+    existing = ClientDataQuota.existing_rows(
+        token.client_id, token.user_id, set(rows) | {row['data_key'] for _, row, _ in conditional}
+    )
+    sizes = {key: size for key, (size, _) in existing.items()}
+    projected = client_data_size_delta(dict(sizes), list(rows.values()) + [row for _, row, _ in conditional])
+    quota_error = ClientDataQuota.check(token.client_id, token.user_id, *projected)
+    if quota_error:
+        return None, (jsonify(error='quota_exceeded', error_description=quota_error), 403)
+
+    # 达到去重阈值的值改为引用值块（先为每一行增加引用，未写入和被覆盖的引用在写入后扣除）
+    ClientDataBlobStore.attach(list(rows.values()) + [row for _, row, _ in conditional])
+
+    written = list(rows.values())
+    if rows:
+        # 冲突时保留原created_at并递增版本号, 无需先查询是否存在, 也不会因并发写入触发唯一约束冲突
+        db.session.execute(DatabaseCompat.upsert(
+            ClientUserData, list(rows.values()),
+            update_columns=['data_value', 'data_codec', 'data_compressed', 'data_size', 'blob_id', 'data_type',
+                            'expires_at', 'updated_at'],
+            increment_columns=['version']
+        ))
+        ClientDataFeed.record(token.client_id, token.user_id, rows.keys())
+
+    blob_deltas = {}
+    for index, row, item in conditional:
+        version = swap_client_data(row, item.get('expected_version'), item.get('expected_id'))
+        if version is None:
+            results[index] = {'key': row['data_key'], 'status': 'conflict',
+                              'error_description': '数据版本不匹配'}
+            if row['blob_id']:
+                blob_deltas[row['blob_id']] = blob_deltas.get(row['blob_id'], 0) - 1
+        else:
+            results[index]['version'] = version
+            written.append(row)
+
+    # 被覆盖的行不再引用原来的值块
+    blob_ids = {key: blob_id for key, (_, blob_id) in existing.items()}
+    for row in written:
+        previous = blob_ids.get(row['data_key'])
+        if previous:
+            blob_deltas[previous] = blob_deltas.get(previous, 0) - 1
+        blob_ids[row['data_key']] = row['blob_id']
+    ClientDataBlobStore.adjust(blob_deltas)
+
+    ClientDataQuota.apply(token.client_id, token.user_id, *client_data_size_delta(sizes, written))
+    return results, None
+
+
+def parse_if_match():
+    """
+    解析If-Match请求头（取自单条读取返回的ETag "<行ID>.<版本号>"，也可直接给出版本号）
+    返回 (行ID, 版本号, 是否要求键存在, 错误响应)；未提供时版本号为None
+    If-Match: * 只要求键存在；版本比较是强比较，弱ETag返回400
+    """
+    if request.if_match.star_tag:
+        return None, None, True, None
+
+    invalid = (None, None, False, (jsonify(error='invalid_request', error_description='无效的If-Match请求头'), 400))
+    tags = request.if_match.as_set(include_weak=True)
+    if not tags:
+        return None, None, False, None
+    if len(tags) != 1 or any(request.if_match.is_weak(tag) for tag in tags):
+        return invalid
+
+    parts = next(iter(tags)).split('.')
+    if len(parts) > 2 or not all(part.isdigit() for part in parts):
+        return invalid
+
+    if len(parts) == 2:
+        return int(parts[0]), int(parts[1]), False, None
+    return None, int(parts[0]), False, None
+
+
 @app.route('/oauth/client_data', methods=['POST', 'PUT'])
+@token_required
 def store_client_data():
-    # 验证访问令牌
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return jsonify(error='invalid_token', error_description='无效的访问令牌'), 401
+    """
+    存储数据
+    单条: {"key": ..., "value": ..., "type": ..., "expected_version": ..., "ttl": ...}，也可通过If-Match给出版本
+    批量: {"items": [{"key": ..., "value": ..., "type": ..., "ttl": ...}, ...]}，一次事务写入并逐条返回结果
+    给出expected_version时以条件UPDATE写入，版本不匹配返回412（批量时该项为conflict）
+    给出ttl（秒）时数据到期后不再返回，并由后台清理删除
+    """
+    # 令牌校验时已联表确认客户端存在（不验证客户端所有者）
+    token = g.access_token
 
-    access_token = auth_header[7:]
-    token = AccessToken.query.filter_by(token=access_token).first()
+    # 获取请求数据
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and 'items' in data:
+        items = data['items']
+        if not isinstance(items, list) or not items:
+            return jsonify(error='invalid_request', error_description='items必须为非空数组'), 400
+        if len(items) > CLIENT_DATA_BATCH_MAX:
+            return jsonify(error='invalid_request',
+                           error_description=f'单次最多写入{CLIENT_DATA_BATCH_MAX}条数据'), 400
+
+        results, error_response = write_client_data_items(token, items)
+        if error_response:
+            db.session.rollback()
+            return error_response
 
-    if not token or token.expires_at < get_utc_now():
-        return jsonify(error='invalid_token', error_description='无效或过期的访问令牌'), 401
+        db.session.commit()
+        change_feed.notify()
 
-    # 🔧 修复：只验证客户端存在，不验证客户端所有者
-    client = OAuthClient.query.filter_by(client_id=token.client_id).first()
-    if not client:
-        return jsonify(
-            error='invalid_client',
-            error_description='客户端不存在'
-        ), 401
+        failed = sum(1 for result in results if result['status'] in ('error', 'conflict'))
+        return jsonify({
+            'status': 'success' if not failed else 'partial',
+            'stored': len(results) - failed,
+            'failed': failed,
+            'results': results
+        })
 
-    # 获取请求数据
-    data = request.get_json()
-    if not data or 'key' not in data:
+    if not isinstance(data, dict) or 'key' not in data:
         return jsonify(error='invalid_request', error_description='缺少数据键名'), 400
 
-    key = data['key']
-    value = data.get('value')
-    data_type = data.get('type', 'string')
-
-    # 查找或创建数据记录 - 使用 token 中的用户ID
-    client_data = ClientUserData.query.filter_by(
-        client_id=token.client_id,
-        user_id=token.user_id,  # 🔧 使用令牌中的用户ID，不是客户端所有者ID
-        data_key=key
-    ).first()
+    # 前置条件: If-Match / expected_version 比较版本号, If-Match: * 只在键存在时写入;
+    # If-None-Match: * 只在键不存在时创建
+    row_id, expected_version, must_exist, error_response = parse_if_match()
+    if error_response:
+        return error_response
+    if request.if_none_match.star_tag:
+        if must_exist:
+            return jsonify(error='precondition_failed', error_description='数据版本不匹配'), 412
+        expected_version = 0
+    if expected_version is not None:
+        data = dict(data, expected_version=expected_version, expected_id=row_id)
+    elif must_exist:
+        data = dict(data, must_exist=True)
+
+    results, error_response = write_client_data_items(token, [data])
+    if error_response:
+        db.session.rollback()
+        return error_response
 
-    if client_data:
-        # 更新现有数据
-        client_data.data_value = json.dumps(value) if value else None
-        client_data.data_type = data_type
-        client_data.updated_at = get_utc_now()
-    else:
-        # 创建新数据
-        client_data = ClientUserData(
-            client_id=token.client_id,
-            user_id=token.user_id,  # 🔧 使用令牌中的用户ID
-            data_key=key,
-            data_value=json.dumps(value) if value else None,
-            data_type=data_type
-        )
-        db.session.add(client_data)
+    result = results[0]
+    if result['status'] == 'error':
+        return jsonify(error='invalid_request', error_description=result['error_description']), 400
+    if result['status'] == 'conflict':
+        db.session.rollback()
+        return jsonify(error='precondition_failed', error_description='数据版本不匹配'), 412
 
     db.session.commit()
+    change_feed.notify()
 
-    return jsonify({
+    response = {
         'status': 'success',
-        'key': key,
+        'key': data['key'],
         'message': '数据存储成功'
-    })
+    }
+    if 'version' in result:
+        response['version'] = result['version']
+    return jsonify(response)
+
+
+# 部分更新（JSON Merge Patch, RFC 7396）
+CLIENT_DATA_PATCH_RETRIES = 3
+
+
+def apply_merge_patch(target, patch):
+    """按RFC 7396合并: 对象逐字段递归合并, null表示删除字段, 其他值直接替换"""
+    if not isinstance(patch, dict):
+        return patch
+
+    result = dict(target) if isinstance(target, dict) else {}
+    for name, value in patch.items():
+        if value is None:
+            result.pop(name, None)
+        else:
+            result[name] = apply_merge_patch(result.get(name), value)
+    return result
+
+
+@app.route('/oauth/client_data', methods=['PATCH'])
+@token_required
+def patch_client_data():
+    """
+    以JSON Merge Patch部分更新数据: PATCH /oauth/client_data?key=...，请求体为合并补丁
+    服务端读取当前值、合并后以版本号条件写入，并发修改时自动重试；
+    提供If-Match时只在版本一致（If-Match: * 为键存在）时写入，否则返回412；ttl参数重新设置过期时间，未提供时保留原过期时间
+    """
+    token = g.access_token
+
+    key = request.args.get('key')
+    # 非整数的ttl原样交给校验，返回400而不是忽略
+    ttl = request.args.get('ttl')
+    if ttl is not None and ttl.isdigit():
+        ttl = int(ttl)
+    error = validate_client_data_item({'key': key, 'ttl': ttl}) if key else '缺少数据键名'
+    if error:
+        return jsonify(error='invalid_request', error_description=error), 400
+
+    try:
+        patch = json.loads(request.get_data(as_text=True))
+    except json.JSONDecodeError:
+        return jsonify(error='invalid_request', error_description='请求体必须为JSON合并补丁'), 400
+
+    row_id, expected_version, must_exist, error_response = parse_if_match()
+    if error_response:
+        return error_response
+
+    for _ in range(CLIENT_DATA_PATCH_RETRIES):
+        now = get_utc_now()
+        current = ClientDataBlobStore.join(db.session.query(
+            ClientUserData.id, ClientUserData.version, ClientUserData.data_type, ClientUserData.expires_at,
+            *ClientDataBlobStore.value_columns()
+        )).filter(
+            ClientUserData.client_id == token.client_id,
+            ClientUserData.user_id == token.user_id,
+            ClientUserData.data_key == key,
+            client_data_alive(now)
+        ).first()
+
+        if must_exist and not current or expected_version is not None and (
+                not current or current.version != expected_version or row_id not in (None, current.id)):
+            return jsonify(error='precondition_failed', error_description='数据版本不匹配'), 412
+
+        if current:
+            target = ClientDataCodec.decode(current.data_codec, current.data_value, current.data_compressed)
+            data_type = request.args.get('type', current.data_type)
+        else:
+            # 键不存在时以空文档为合并目标
+            target = None
+            data_type = request.args.get('type', 'object')
+
+        results, error_response = write_client_data_items(token, [{
+            'key': key,
+            'value': apply_merge_patch(target, patch),
+            'type': data_type,
+            # 保留原过期时间（按剩余秒数向上取整）
+            'ttl': ttl or (math.ceil((current.expires_at - now).total_seconds())
+                           if current and current.expires_at else None),
+            'expected_version': current.version if current else 0,
+            'expected_id': current.id if current else None
+        }])
+        if error_response:
+            db.session.rollback()
+            return error_response
+
+        if results[0]['status'] == 'stored':
+            db.session.commit()
+            change_feed.notify()
+            return jsonify({
+                'status': 'success',
+                'key': key,
+                'version': results[0]['version'],
+                'message': '数据更新成功'
+            })
+
+        # 期间被其他请求修改，重新读取后再合并
+        db.session.rollback()
+
+    return jsonify(error='conflict', error_description='数据正在被并发修改，请重试'), 409
+
+
+# 客户端数据分页读取
+CLIENT_DATA_PAGE_SIZE = 100
+CLIENT_DATA_PAGE_MAX = 1000
+
+
+def encode_data_cursor(user_id, data_key):
+    """分页游标: (user_id, data_key) 的JSON经base64url编码"""
+    raw = json.dumps([user_id, data_key], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_data_cursor(cursor):
+    """解析分页游标, 无效时返回None"""
+    try:
+        user_id, data_key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(user_id, int) or not isinstance(data_key, str):
+        return None
+    return user_id, data_key
+
+
+CLIENT_DATA_COLUMNS = {
+    'key': (ClientUserData.data_key,),
+    'value': ClientDataBlobStore.value_columns(),
+    'type': (ClientUserData.data_type,),
+    'user_id': (ClientUserData.user_id,),
+    'version': (ClientUserData.version,),
+    'expires_at': (ClientUserData.expires_at,),
+    'updated_at': (ClientUserData.updated_at,),
+}
+# 默认返回字段（第三方应用 / 应用所有者）
+CLIENT_DATA_FIELDS = ('key', 'value', 'type', 'version', 'updated_at')
+CLIENT_DATA_OWNER_FIELDS = ('key', 'value', 'type', 'user_id', 'version', 'updated_at')
+CLIENT_DATA_STREAM_BATCH = 1000
+
+
+def key_prefix_condition(prefix):
+    """键名前缀匹配条件（转义LIKE通配符）"""
+    escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return ClientUserData.data_key.like(escaped + '%', escape='\\')
+
+
+def build_client_data_query(client_id, user_id=None, default_fields=CLIENT_DATA_FIELDS):
+    """
+    按请求参数构造客户端数据查询，返回 (查询, 返回字段, 错误响应)
+    - prefix: 只返回指定前缀的键
+    - fields: 逗号分隔的返回字段, 不含value时不读取数据值列
+    - cursor: 从 (user_id, data_key) 之后继续读取
+    """
+    fields = request.args.get('fields')
+    if fields:
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in CLIENT_DATA_COLUMNS]
+        if unknown or not fields:
+            return None, None, (jsonify(error='invalid_request',
+                                        error_description=f'不支持的字段: {",".join(unknown)}'), 400)
+    else:
+        fields = list(default_fields)
+
+    # 游标所需的 user_id 和 data_key 总是读取
+    query = db.session.query(
+        ClientUserData.user_id, ClientUserData.data_key,
+        *[column for field in fields if field not in ('key', 'user_id') for column in CLIENT_DATA_COLUMNS[field]]
+    ).filter(ClientUserData.client_id == client_id, client_data_alive())
+
+    if 'value' in fields:
+        query = ClientDataBlobStore.join(query)
+
+    if user_id is not None:
+        query = query.filter(ClientUserData.user_id == user_id)
+
+    prefix = request.args.get('prefix')
+    if prefix:
+        query = query.filter(key_prefix_condition(prefix))
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        position = decode_data_cursor(cursor)
+        if not position:
+            return None, None, (jsonify(error='invalid_request', error_description='无效的分页游标'), 400)
+        cursor_user_id, cursor_key = position
+        query = query.filter(or_(
+            ClientUserData.user_id > cursor_user_id,
+            and_(ClientUserData.user_id == cursor_user_id, ClientUserData.data_key > cursor_key)
+        ))
+
+    # (client_id, user_id, data_key) 唯一约束同时提供了分页所需的顺序
+    return query.order_by(ClientUserData.user_id, ClientUserData.data_key), fields, None
+
+
+def client_data_row_to_item(row, fields):
+    """按返回字段序列化一行数据"""
+    item = {}
+    for field in fields:
+        if field == 'key':
+            item['key'] = row.data_key
+        elif field == 'value':
+            item['value'] = ClientDataCodec.raw(row.data_codec, row.data_value, row.data_compressed)
+        elif field == 'type':
+            item['type'] = row.data_type
+        elif field == 'user_id':
+            item['user_id'] = row.user_id
+        elif field == 'version':
+            item['version'] = row.version
+        elif field == 'expires_at':
+            item['expires_at'] = row.expires_at.isoformat() if row.expires_at else None
+        elif field == 'updated_at':
+            item['updated_at'] = row.updated_at.isoformat() if row.updated_at else None
+    return item
+
+
+def query_client_data(client_id, user_id=None, default_fields=CLIENT_DATA_FIELDS):
+    """
+    按请求参数读取客户端数据，返回 (结果列表, 下一页游标, 错误响应)
+    - limit / cursor: 按 (user_id, data_key) 键集分页, 未提供时返回全部数据且游标为False（兼容旧响应）
+    - prefix / fields: 见 build_client_data_query
+    """
+    paged = 'limit' in request.args or 'cursor' in request.args
+    limit = request.args.get('limit', CLIENT_DATA_PAGE_SIZE, type=int)
+    if limit is None or limit < 1:
+        return None, None, (jsonify(error='invalid_request', error_description='limit必须为正整数'), 400)
+    limit = min(limit, CLIENT_DATA_PAGE_MAX)
+
+    query, fields, error_response = build_client_data_query(client_id, user_id, default_fields)
+    if error_response:
+        return None, None, error_response
+
+    rows = query.limit(limit + 1).all() if paged else query.all()
+
+    next_cursor = None
+    if paged and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_data_cursor(rows[-1].user_id, rows[-1].data_key)
+
+    result = [client_data_row_to_item(row, fields) for row in rows]
+    return result, (next_cursor if paged else False), None
+
+
+def client_data_etag(client_id, user_id):
+    """
+    根据当前查询条件下数据的行数、最大更新时间、最大ID和版本号之和计算ETag（与查询参数一起决定响应内容）
+    每次写入都会递增版本号；MySQL的更新时间只精确到秒，同一秒内的两次更新只能由版本号之和区分
+    返回 (ETag, 错误响应)
+    """
+    query, fields, error_response = build_client_data_query(client_id, user_id)
+    if error_response:
+        return None, error_response
+
+    count, last_updated, last_id, version_sum = query.order_by(None).with_entities(
+        func.count(ClientUserData.id), func.max(ClientUserData.updated_at), func.max(ClientUserData.id),
+        func.sum(ClientUserData.version)
+    ).one()
+    return compute_etag('list', client_id, user_id, count, last_updated, last_id, version_sum,
+                        request.query_string.decode('utf-8', 'replace')), None
+
+
+def wants_ndjson():
+    """请求是否要求NDJSON流式输出（?format=ndjson 或 Accept: application/x-ndjson）"""
+    if request.args.get('format') == 'ndjson':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+
+
+def stream_client_data(client_id, user_id=None, default_fields=CLIENT_DATA_FIELDS):
+    """
+    以NDJSON流式导出客户端数据（每行一条JSON）
+    使用服务端游标分批读取，内存占用与数据量无关；支持 prefix / fields / cursor 参数
+    """
+    query, fields, error_response = build_client_data_query(client_id, user_id, default_fields)
+    if error_response:
+        return error_response
+
+    def generate():
+        for row in query.yield_per(CLIENT_DATA_STREAM_BATCH):
+            yield dumps_raw_json(client_data_row_to_item(row, fields)) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'X-Accel-Buffering': 'no'})
 
 
 # 读取第三方网站数据的端点
 @app.route('/oauth/client_data', methods=['GET'])
+@token_required
 def get_client_data():
-    # 验证访问令牌
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return jsonify(error='invalid_token', error_description='无效的访问令牌'), 401
-
-    access_token = auth_header[7:]
-    token = AccessToken.query.filter_by(token=access_token).first()
-
-    if not token or token.expires_at < get_utc_now():
-        return jsonify(error='invalid_token', error_description='无效或过期的访问令牌'), 401
+    token = g.access_token
 
     # 获取查询参数
     key = request.args.get('key')
@@ -1271,116 +3468,389 @@ def get_client_data():
             client_id=token.client_id,
             user_id=token.user_id,  # 🔧 使用令牌中的用户ID
             data_key=key
-        ).first()
+        ).filter(client_data_alive()).first()
 
         if not client_data:
             return jsonify(error='not_found', error_description='数据不存在'), 404
 
-        # 解析存储的值
-        value = None
-        if client_data.data_value:
-            try:
-                value = json.loads(client_data.data_value)
-            except json.JSONDecodeError:
-                value = client_data.data_value
+        # ETag由行ID和版本号组成，可直接用于写入时的If-Match；未修改时直接返回304，无需解析存储的值
+        etag = f'{client_data.id}.{client_data.version}'
+        response = not_modified_response(etag)
+        if response:
+            return response
 
-        return jsonify({
+        # 去重存储的值从值块读取
+        stored = db.session.get(ClientDataBlob, client_data.blob_id) if client_data.blob_id else client_data
+        return with_etag(raw_json_response({
             'key': client_data.data_key,
-            'value': value,
+            'value': ClientDataCodec.raw(stored.data_codec, stored.data_value, stored.data_compressed),
             'type': client_data.data_type,
+            'version': client_data.version,
+            'expires_at': client_data.expires_at.isoformat() if client_data.expires_at else None,
             'updated_at': client_data.updated_at.isoformat()
-        })
+        }), etag)
     else:
-        # 获取所有数据
-        all_data = ClientUserData.query.filter_by(
-            client_id=token.client_id,
+        # 先用聚合查询（行数、最大更新时间、最大ID、版本号之和）计算ETag，未修改时不读取任何数据值
+        etag, error_response = client_data_etag(token.client_id, token.user_id)
+        if error_response:
+            return error_response
+        response = not_modified_response(etag)
+        if response:
+            return response
+
+        # 获取所有数据（支持分页、前缀过滤和字段投影）
+        result, next_cursor, error_response = query_client_data(
+            token.client_id,
             user_id=token.user_id  # 🔧 使用令牌中的用户ID
-        ).all()
-
-        result = []
-        for item in all_data:
-            value = None
-            if item.data_value:
-                try:
-                    value = json.loads(item.data_value)
-                except json.JSONDecodeError:
-                    value = item.data_value
-
-            result.append({
-                'key': item.data_key,
-                'value': value,
-                'type': item.data_type,
-                'updated_at': item.updated_at.isoformat()
-            })
+        )
+        if error_response:
+            return error_response
 
-        return jsonify(result)
+        if next_cursor is False:
+            return with_etag(raw_json_response(result), etag)
+        return with_etag(raw_json_response({'items': result, 'next_cursor': next_cursor}), etag)
 
 
 # 删除数据的端点
 @app.route('/oauth/client_data', methods=['DELETE'])
+@token_required
 def delete_client_data():
-    # 验证访问令牌
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return jsonify(error='invalid_token', error_description='无效的访问令牌'), 401
+    """
+    删除数据
+    单条: ?key=...，数据不存在时返回404
+    批量: JSON {"keys": [...]}、?prefix=... 或 ?all=true，一条DELETE语句删除并返回删除条数
+    """
+    token = g.access_token
 
-    access_token = auth_header[7:]
-    token = AccessToken.query.filter_by(token=access_token).first()
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and 'keys' in data:
+        keys = data['keys']
+        if not isinstance(keys, list) or not keys or not all(isinstance(key, str) and key for key in keys):
+            return jsonify(error='invalid_request', error_description='keys必须为非空的键名数组'), 400
+        if len(keys) > CLIENT_DATA_BATCH_MAX:
+            return jsonify(error='invalid_request',
+                           error_description=f'单次最多删除{CLIENT_DATA_BATCH_MAX}个键'), 400
+        return delete_client_data_where(token, ClientUserData.data_key.in_(set(keys)))
 
-    if not token or token.expires_at < get_utc_now():
-        return jsonify(error='invalid_token', error_description='无效或过期的访问令牌'), 401
+    if request.args.get('prefix'):
+        return delete_client_data_where(token, key_prefix_condition(request.args['prefix']))
+
+    if request.args.get('all', '').lower() in ('true', '1'):
+        return delete_client_data_where(token)
 
     # 获取要删除的键
     key = request.args.get('key')
     if not key:
         return jsonify(error='invalid_request', error_description='缺少数据键名'), 400
 
-    # 删除数据
+    # 删除数据（已过期的键与读取一致按不存在处理，由后台清理删除）
     client_data = ClientUserData.query.filter_by(
         client_id=token.client_id,
         user_id=token.user_id,  # 🔧 使用令牌中的用户ID
         data_key=key
-    ).first()
+    ).filter(client_data_alive()).first()
 
     if client_data:
         db.session.delete(client_data)
+        if client_data.blob_id:
+            ClientDataBlobStore.adjust({client_data.blob_id: -1})
+        ClientDataFeed.record(token.client_id, token.user_id, [key], op='delete')
+        ClientDataQuota.apply(token.client_id, token.user_id, -1, -ClientDataQuota.row_size(client_data))
         db.session.commit()
+        change_feed.notify()
         return jsonify({'status': 'success', 'message': '数据删除成功'})
     else:
         return jsonify(error='not_found', error_description='数据不存在'), 404
 
 
+def delete_client_data_where(token, *conditions):
+    """
+    在一个事务中删除令牌用户符合条件的数据（记录删除标记、扣减用量），返回删除条数
+    只删除未过期的行，已过期的行由后台清理删除并记录
+    """
+    conditions = (
+        ClientUserData.client_id == token.client_id,
+        ClientUserData.user_id == token.user_id,  # 🔧 使用令牌中的用户ID
+        client_data_alive(get_utc_now()),
+        *conditions
+    )
+    ClientDataFeed.record_deletes(*conditions)
+    ClientDataQuota.apply_deletes(*conditions)
+    ClientDataBlobStore.release(*conditions)
+    deleted_count = ClientUserData.query.filter(*conditions).delete(synchronize_session=False)
+    db.session.commit()
+    change_feed.notify()
+
+    return jsonify({
+        'status': 'success',
+        'deleted_count': deleted_count,
+        'message': f'已删除 {deleted_count} 条数据'
+    })
+
+
 # 获取客户端存储数据的API端点
 @app.route('/api/client_data/<client_id>')
-@login_required
+@client_owner_required
 def get_client_data_api(client_id):
-    """获取客户端存储的数据 - 支持所有者访问"""
-    # 验证客户端是否属于当前用户
-    client = OAuthClient.query.filter_by(client_id=client_id, user_id=current_user.id).first()
-    if not client:
-        return jsonify(error='客户端不存在或无权访问'), 404
+    """获取客户端存储的数据 - 支持所有者访问和应用级令牌"""
+    if wants_ndjson():
+        return stream_client_data(client_id, default_fields=CLIENT_DATA_OWNER_FIELDS)
+
+    # 获取该客户端的数据（支持分页、前缀过滤和字段投影）
+    result, next_cursor, error_response = query_client_data(
+        client_id, default_fields=CLIENT_DATA_OWNER_FIELDS
+    )
+    if error_response:
+        return error_response
+
+    if next_cursor is False:
+        return raw_json_response(result)
+    return raw_json_response({'items': result, 'next_cursor': next_cursor})
+
+
+@app.route('/api/client_data/<client_id>/storage')
+@client_owner_required
+def get_client_data_storage(client_id):
+    """客户端数据的存储统计（行数、压缩行数、原始/存储字节数及其比值）"""
+    return jsonify(ClientDataCodec.storage_stats(client_id))
+
+
+@app.route('/api/client_data/<client_id>/usage')
+@client_owner_required
+def get_client_data_usage(client_id):
+    """客户端数据用量与配额（读取计数表，不扫描数据）；可用user_id参数查看单个用户"""
+    user_id = request.args.get('user_id', type=int)
+    usage = ClientDataQuota.usage(client_id, user_id)
+    limits = ClientDataQuota.limits
+
+    result = {
+        'rows': usage['client'][0],
+        'bytes': usage['client'][1],
+        'max_rows': limits['rows_per_client'],
+        'max_bytes': limits['bytes_per_client'],
+        'max_rows_per_user': limits['rows_per_user'],
+        'max_bytes_per_user': limits['bytes_per_user']
+    }
+    if user_id is not None:
+        result['user'] = {'user_id': user_id, 'rows': usage['user'][0], 'bytes': usage['user'][1]}
+    return jsonify(result)
 
-    # 获取该客户端的所有数据
-    client_data = ClientUserData.query.filter_by(client_id=client_id).all()
 
-    result = []
-    for item in client_data:
-        value = None
-        if item.data_value:
-            try:
-                value = json.loads(item.data_value)
-            except json.JSONDecodeError:
-                value = item.data_value
-
-        result.append({
-            'key': item.data_key,
-            'value': value,
-            'type': item.data_type,
-            'user_id': item.user_id,
-            'updated_at': item.updated_at.isoformat()
-        })
+@app.route('/api/client_data/<client_id>/query', methods=['POST'])
+@client_owner_required
+def query_client_data_by_json(client_id):
+    """
+    按JSON路径条件查询客户端数据（条件之间为AND）
+    请求体: {"where": [{"path": "$.theme", "op": "eq", "value": "dark"}], "key"/"prefix", "fields", "limit", "cursor"}
+    op: eq / ne / gt / gte / lt / lte / exists；返回 {"items": [...], "next_cursor": ...}
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify(error='invalid_request', error_description='请求体必须是JSON对象'), 400
+
+    predicates, error = ClientDataJSONQuery.parse_predicates(data.get('where'))
+    if error:
+        return jsonify(error='invalid_request', error_description=error), 400
+
+    fields = data.get('fields') or list(CLIENT_DATA_OWNER_FIELDS)
+    if not isinstance(fields, list) or any(field not in CLIENT_DATA_COLUMNS for field in fields):
+        return jsonify(error='invalid_request', error_description='不支持的返回字段'), 400
+
+    limit = data.get('limit', CLIENT_DATA_PAGE_SIZE)
+    if not isinstance(limit, int) or isinstance(limit, bool) or limit < 1:
+        return jsonify(error='invalid_request', error_description='limit必须为正整数'), 400
+    limit = min(limit, CLIENT_DATA_PAGE_MAX)
+
+    conditions = [ClientUserData.client_id == client_id, client_data_alive()]
+    if isinstance(data.get('key'), str):
+        conditions.append(ClientUserData.data_key == data['key'])
+    elif isinstance(data.get('prefix'), str) and data['prefix']:
+        conditions.append(key_prefix_condition(data['prefix']))
+
+    cursor = data.get('cursor')
+    if cursor:
+        position = decode_data_cursor(cursor) if isinstance(cursor, str) else None
+        if not position:
+            return jsonify(error='invalid_request', error_description='无效的分页游标'), 400
+        cursor_user_id, cursor_key = position
+        conditions.append(or_(
+            ClientUserData.user_id > cursor_user_id,
+            and_(ClientUserData.user_id == cursor_user_id, ClientUserData.data_key > cursor_key)
+        ))
+
+    order = (ClientUserData.user_id, ClientUserData.data_key)
+    keys_query = db.session.query(ClientUserData.user_id, ClientUserData.data_key).filter(*conditions)
+
+    # 未压缩的数据在SQL中过滤；去重存储的值在值块上过滤（同一值块被大量行引用时只存一份）
+    def json_matches():
+        return keys_query.filter(
+            ClientUserData.data_codec == 'json', ClientUserData.data_value.isnot(None),
+            *[ClientDataJSONQuery.condition(predicate) for predicate in predicates]
+        ).order_by(*order).limit(limit + 1).all()
 
-    return jsonify(result)
+    try:
+        matched = json_matches()
+    except (OperationalError, ProgrammingError):
+        # 生成列可能已被其他进程删除（drop-json-index），重新读取表结构后按json_extract重试
+        db.session.rollback()
+        if not ClientDataJSONQuery.refresh_indexed_columns():
+            raise
+        matched = json_matches()
+    matched += keys_query.join(ClientDataBlob, ClientDataBlob.id == ClientUserData.blob_id).filter(
+        ClientDataBlob.data_codec == 'json',
+        *[ClientDataJSONQuery.condition(predicate, ClientDataBlob.data_value) for predicate in predicates]
+    ).order_by(*order).limit(limit + 1).all()
+    matched = sorted((row.user_id, row.data_key) for row in matched)[:limit + 1]
+
+    # 压缩的数据（较大的值，通常很少）逐行解压过滤，与SQL结果按分页顺序合并；同一值块只解压一次
+    compressed = ClientDataBlobStore.join(db.session.query(
+        ClientUserData.user_id, ClientUserData.data_key, ClientUserData.blob_id,
+        *ClientDataBlobStore.value_columns()
+    )).filter(*conditions, or_(ClientUserData.data_codec == 'zlib', ClientDataBlob.data_codec == 'zlib')) \
+        .order_by(*order)
+    blob_matches = {}
+    for row in compressed.yield_per(CLIENT_DATA_STREAM_BATCH):
+        position = (row.user_id, row.data_key)
+        if len(matched) > limit and position > matched[limit]:
+            break
+        if row.blob_id in blob_matches:
+            is_match = blob_matches[row.blob_id]
+        else:
+            is_match = ClientDataJSONQuery.matches(
+                ClientDataCodec.decode('zlib', None, row.data_compressed), predicates)
+            if row.blob_id:
+                blob_matches[row.blob_id] = is_match
+        if is_match:
+            matched = sorted(matched + [position])[:limit + 1]
+
+    next_cursor = None
+    if len(matched) > limit:
+        matched = matched[:limit]
+        next_cursor = encode_data_cursor(*matched[-1])
+
+    # 按匹配的键读取返回字段
+    rows = []
+    if matched:
+        query = db.session.query(ClientUserData.user_id, ClientUserData.data_key, *[
+            column for field in fields if field not in ('key', 'user_id') for column in CLIENT_DATA_COLUMNS[field]
+        ])
+        if 'value' in fields:
+            query = ClientDataBlobStore.join(query)
+        rows = query.filter(
+            ClientUserData.client_id == client_id,
+            tuple_(ClientUserData.user_id, ClientUserData.data_key).in_(matched)
+        ).order_by(*order).all()
+
+    return raw_json_response({
+        'items': [client_data_row_to_item(row, fields) for row in rows],
+        'next_cursor': next_cursor
+    })
+
+
+# 客户端数据变更订阅
+CLIENT_DATA_FEED_PAGE_SIZE = 500
+CLIENT_DATA_FEED_MAX_WAIT = 30
+CLIENT_DATA_FEED_POLL_INTERVAL = 1.0
+# MySQL的自增ID按插入顺序分配但提交顺序不定，较小的序号可能晚于较大的序号提交；
+# 只返回早于 最近该秒数内产生的第一条变更 的记录，超过该时长才提交的事务中的变更仍可能被跳过
+CLIENT_DATA_FEED_COMMIT_LAG = 2
+
+
+def client_data_changes_safe_point(since):
+    """可以安全返回的序号上限（不含），None表示不限制；SQLite写入串行提交，无需限制"""
+    if not USE_MYSQL:
+        return None
+    return db.session.query(func.min(ClientDataChange.id)).filter(
+        ClientDataChange.id > since,
+        ClientDataChange.created_at > get_utc_now() - timedelta(seconds=CLIENT_DATA_FEED_COMMIT_LAG)
+    ).scalar()
+
+
+def query_client_data_changes(client_id, since, limit):
+    """读取序号大于since的变更，upsert附带数据的当前值（已删除则为null）"""
+    conditions = [ClientDataChange.client_id == client_id, ClientDataChange.id > since]
+    safe_point = client_data_changes_safe_point(since)
+    if safe_point is not None:
+        conditions.append(ClientDataChange.id < safe_point)
+
+    rows = db.session.query(
+        ClientDataChange.id, ClientDataChange.op, ClientDataChange.user_id, ClientDataChange.data_key,
+        ClientDataChange.created_at, ClientUserData.data_type, ClientUserData.version,
+        *ClientDataBlobStore.value_columns()
+    ).outerjoin(ClientUserData, and_(
+        ClientUserData.client_id == ClientDataChange.client_id,
+        ClientUserData.user_id == ClientDataChange.user_id,
+        ClientUserData.data_key == ClientDataChange.data_key,
+        ClientDataChange.op == 'upsert',
+        client_data_alive()
+    )).outerjoin(ClientDataBlob, ClientDataBlob.id == ClientUserData.blob_id).filter(
+        *conditions
+    ).order_by(ClientDataChange.id).limit(limit + 1).all()
+
+    changes = []
+    for row in rows[:limit]:
+        change = {
+            'seq': row.id,
+            'op': row.op,
+            'user_id': row.user_id,
+            'key': row.data_key,
+            'changed_at': row.created_at.isoformat()
+        }
+        if row.op == 'upsert':
+            change['type'] = row.data_type
+            change['version'] = row.version
+            change['value'] = ClientDataCodec.raw(row.data_codec, row.data_value, row.data_compressed) \
+                if row.version is not None else None
+        changes.append(change)
+
+    return changes, len(rows) > limit
+
+
+@app.route('/api/client_data/<client_id>/changes')
+@client_owner_required
+def get_client_data_changes(client_id):
+    """
+    按变更序号读取数据变更（删除以op=delete的标记返回）
+    - since: 上次返回的next_since；为latest时只返回当前最新序号（先取最新序号再全量导出，之后从该序号开始订阅）
+    - wait: 没有新变更时最多等待的秒数（长轮询，最大30秒）
+    - limit: 每次最多返回的变更数
+    游标早于变更记录保留范围时返回410，订阅方需重新全量同步
+    """
+    since = request.args.get('since', '0')
+    if since == 'latest':
+        latest = db.session.query(func.max(ClientDataChange.id)).scalar() or 0
+        return jsonify({'changes': [], 'next_since': latest, 'has_more': False})
+
+    if not since.isdigit():
+        return jsonify(error='invalid_request', error_description='无效的since参数'), 400
+    since = int(since)
+
+    limit = min(max(request.args.get('limit', CLIENT_DATA_FEED_PAGE_SIZE, type=int) or 1, 1),
+                CLIENT_DATA_FEED_PAGE_SIZE)
+    wait = min(max(request.args.get('wait', 0, type=float) or 0, 0), CLIENT_DATA_FEED_MAX_WAIT)
+
+    # 序号之间的记录已被清理（或从未同步过的旧游标）；游标大于当前最大序号或记录已全部清理时，
+    # 无法确认期间是否有变更被清理，同样要求重新同步
+    oldest, newest = db.session.query(func.min(ClientDataChange.id), func.max(ClientDataChange.id)).one()
+    if since and (oldest is None or oldest > since + 1 or since > newest):
+        return jsonify(error='cursor_expired', error_description='变更记录已被清理，请重新全量同步'), 410
+
+    deadline = time.monotonic() + wait
+    while True:
+        changes, has_more = query_client_data_changes(client_id, since, limit)
+        remaining = deadline - time.monotonic()
+        if changes or remaining <= 0:
+            break
+
+        # 结束当前事务，避免等待期间持有连接和读快照
+        db.session.rollback()
+        change_feed.wait(min(remaining, CLIENT_DATA_FEED_POLL_INTERVAL))
+
+    return raw_json_response({
+        'changes': changes,
+        'next_since': changes[-1]['seq'] if changes else since,
+        'has_more': has_more
+    })
 
 
 # 删除客户端所有数据的API端点
@@ -1397,10 +3867,14 @@ def delete_all_client_data(client_id):
                 'message': '只有应用所有者可以删除数据'
             }), 403
 
-        # 删除该客户端的所有数据
+        # 删除该客户端的所有数据（先为每一行记录删除标记）
+        ClientDataFeed.record_deletes(ClientUserData.client_id == client_id)
+        ClientDataBlobStore.release(ClientUserData.client_id == client_id)
         deleted_count = ClientUserData.query.filter_by(client_id=client_id).delete()
+        ClientDataQuota.purge(client_id=client_id)
 
         db.session.commit()
+        change_feed.notify()
 
         return jsonify({
             'message': f'已成功删除 {deleted_count} 条数据',
@@ -1431,13 +3905,23 @@ def delete_client_data_item(client_id):
         return jsonify(error='缺少键名参数'), 400
 
     # 删除特定数据项
+    item_conditions = (
+        ClientUserData.client_id == client_id,
+        ClientUserData.user_id == current_user.id,
+        ClientUserData.data_key == key
+    )
+    ClientDataQuota.apply_deletes(*item_conditions)
+    ClientDataBlobStore.release(*item_conditions)
     deleted_count = ClientUserData.query.filter_by(
         client_id=client_id,
         user_id=current_user.id,
         data_key=key
     ).delete()
+    if deleted_count:
+        ClientDataFeed.record(client_id, current_user.id, [key], op='delete')
 
     db.session.commit()
+    change_feed.notify()
 
     if deleted_count > 0:
         return jsonify({
@@ -1512,30 +3996,23 @@ def get_public_client_data(client_id):
         if not client:
             return jsonify(error='无效的数据访问令牌或数据公开功能未开启'), 401
 
-        # 获取该客户端的所有公开数据
-        client_data = ClientUserData.query.filter_by(client_id=client_id).all()
-
-        result = []
-        for item in client_data:
-            value = None
-            if item.data_value:
-                try:
-                    value = json.loads(item.data_value)
-                except json.JSONDecodeError:
-                    value = item.data_value
-
-            result.append({
-                'key': item.data_key,
-                'value': value,
-                'type': item.data_type,
-                'user_id': item.user_id,
-                'updated_at': item.updated_at.isoformat()
-            })
+        if wants_ndjson():
+            return stream_client_data(client_id, default_fields=CLIENT_DATA_OWNER_FIELDS)
 
-        return jsonify({
+        # 获取该客户端的公开数据（支持分页、前缀过滤和字段投影）
+        result, next_cursor, error_response = query_client_data(
+            client_id, default_fields=CLIENT_DATA_OWNER_FIELDS
+        )
+        if error_response:
+            return error_response
+
+        response = {
             'client_name': client.client_name,
             'data': result
-        })
+        }
+        if next_cursor is not False:
+            response['next_cursor'] = next_cursor
+        return raw_json_response(response)
 
     except Exception as e:
         return jsonify({
@@ -1586,6 +4063,7 @@ def edit_oauth_client(client_id):
     client.redirect_uris = redirect_uris_json
 
     db.session.commit()
+    client_registry.refresh(client)
 
     flash('客户端信息更新成功!', 'success')
     return redirect(url_for('oauth_clients'))
@@ -1750,9 +4228,10 @@ def get_authorized_apps():
             user_id=current_user.id
         ).all()
 
-        # 获取用户的所有访问令牌
+        # 获取用户的所有访问令牌（不含应用所有者自己的应用级令牌）
         access_tokens = AccessToken.query.filter_by(
-            user_id=current_user.id
+            user_id=current_user.id,
+            grant_type='authorization_code'
         ).all()
 
         # 收集所有唯一的客户端ID
@@ -1775,6 +4254,7 @@ def get_authorized_apps():
                 active_token = AccessToken.query.filter(
                     AccessToken.user_id == current_user.id,
                     AccessToken.client_id == client_id,
+                    AccessToken.grant_type == 'authorization_code',
                     AccessToken.expires_at > get_utc_now()  # 修正：使用 > 操作符而不是 __gt
                 ).first()
 
@@ -1820,10 +4300,13 @@ def revoke_authorization(client_id):
 
         # 只删除访问令牌和标记授权码为已使用，不清除用户数据
         # 删除该客户端的所有访问令牌
-        AccessToken.query.filter_by(
+        tokens = AccessToken.query.filter_by(
             user_id=current_user.id,
             client_id=client_id
-        ).delete()
+        )
+        revoke_signed_tokens(tokens)
+        tokens.delete()
+        RefreshToken.query.filter_by(user_id=current_user.id, client_id=client_id).delete()
 
         # 标记该客户端的所有授权码为已使用（使其失效）
         auth_codes = AuthorizationCode.query.filter_by(
@@ -1836,6 +4319,8 @@ def revoke_authorization(client_id):
             auth_code.used = True
 
         db.session.commit()
+        token_cache.invalidate_where(user_id=current_user.id, client_id=client_id)
+        revocation_list.invalidate()
 
         return jsonify({
             'message': f'已成功取消对 {client.client_name} 的授权',
@@ -1883,10 +4368,13 @@ def batch_revoke_authorizations():
                     continue
 
                 # 只删除访问令牌，不清除数据
-                AccessToken.query.filter_by(
+                tokens = AccessToken.query.filter_by(
                     user_id=current_user.id,
                     client_id=client_id
-                ).delete()
+                )
+                revoke_signed_tokens(tokens)
+                tokens.delete()
+                RefreshToken.query.filter_by(user_id=current_user.id, client_id=client_id).delete()
 
                 # 标记授权码为已使用
                 auth_codes = AuthorizationCode.query.filter_by(
@@ -1910,6 +4398,9 @@ def batch_revoke_authorizations():
                 })
 
         db.session.commit()
+        for app_info in revoked_apps:
+            token_cache.invalidate_where(user_id=current_user.id, client_id=app_info['client_id'])
+        revocation_list.invalidate()
 
         return jsonify({
             'message': '批量取消授权完成',
@@ -1944,6 +4435,7 @@ def get_authorization_details(client_id):
         active_token = AccessToken.query.filter(
             AccessToken.user_id == current_user.id,
             AccessToken.client_id == client_id,
+            AccessToken.grant_type == 'authorization_code',
             AccessToken.expires_at > get_utc_now()  # 修正：使用 > 操作符
         ).first()
 
@@ -1957,7 +4449,7 @@ def get_authorization_details(client_id):
         stored_data = ClientUserData.query.filter_by(
             user_id=current_user.id,
             client_id=client_id
-        ).all()
+        ).with_entities(ClientUserData.data_key, ClientUserData.data_type, ClientUserData.updated_at).all()
 
         # 格式化授权历史
         history_list = []
@@ -1972,13 +4464,6 @@ def get_authorization_details(client_id):
         # 格式化存储的数据
         data_list = []
         for data in stored_data:
-            value = None
-            if data.data_value:
-                try:
-                    value = json.loads(data.data_value)
-                except json.JSONDecodeError:
-                    value = data.data_value
-
             data_list.append({
                 'key': data.data_key,
                 'type': data.data_type,
@@ -2050,6 +4535,7 @@ def upload_avatar():
         # 更新用户头像
         current_user.avatar = img_base64
         db.session.commit()
+        token_cache.invalidate_where(user_id=current_user.id)
 
         return jsonify({
             'success': True,
@@ -2069,6 +4555,7 @@ def remove_avatar():
     try:
         current_user.avatar = None
         db.session.commit()
+        token_cache.invalidate_where(user_id=current_user.id)
         return jsonify({'success': True, 'message': '头像已移除'})
     except Exception as e:
         db.session.rollback()
@@ -2240,6 +4727,7 @@ def change_email():
             current_user.email_verified = True  # 新邮箱已验证
 
             db.session.commit()
+            token_cache.invalidate_where(user_id=current_user.id)
 
             return jsonify({
                 'success': True,
@@ -2557,23 +5045,40 @@ def admin_delete_user(user_id):
         for client in clients:
             # 删除客户端相关的授权码和访问令牌
             AuthorizationCode.query.filter_by(client_id=client.client_id).delete()
+            revoke_signed_tokens(AccessToken.query.filter_by(client_id=client.client_id))
             AccessToken.query.filter_by(client_id=client.client_id).delete()
+            RefreshToken.query.filter_by(client_id=client.client_id).delete()
+            ClientDataBlobStore.release(ClientUserData.client_id == client.client_id)
             ClientUserData.query.filter_by(client_id=client.client_id).delete()
+            ClientDataFeed.purge_client(client.client_id)
+            ClientDataQuota.purge(client_id=client.client_id)
             db.session.delete(client)
 
         # 2. 删除用户的授权码
         AuthorizationCode.query.filter_by(user_id=user_id).delete()
 
         # 3. 删除用户的访问令牌
+        revoke_signed_tokens(AccessToken.query.filter_by(user_id=user_id))
         AccessToken.query.filter_by(user_id=user_id).delete()
+        RefreshToken.query.filter_by(user_id=user_id).delete()
 
-        # 4. 删除用户的客户端数据
+        # 4. 删除用户的客户端数据（为其他应用记录删除标记）
+        ClientDataFeed.record_deletes(ClientUserData.user_id == user_id)
+        ClientDataQuota.apply_deletes(ClientUserData.user_id == user_id)
+        ClientDataBlobStore.release(ClientUserData.user_id == user_id)
         ClientUserData.query.filter_by(user_id=user_id).delete()
+        ClientDataQuota.purge(user_id=user_id)
 
         # 5. 删除用户
         db.session.delete(user)
         db.session.commit()
 
+        token_cache.invalidate_where(user_id=user_id)
+        for client in clients:
+            token_cache.invalidate_where(client_id=client.client_id)
+            client_registry.remove(client.client_id)
+        revocation_list.invalidate()
+
         return jsonify({
             'success': True,
             'message': f'用户 {user.username} 已成功删除'
@@ -2596,11 +5101,19 @@ def admin_delete_client(client_id):
 
         # 删除客户端相关的所有数据
         AuthorizationCode.query.filter_by(client_id=client_id).delete()
+        revoke_signed_tokens(AccessToken.query.filter_by(client_id=client_id))
         AccessToken.query.filter_by(client_id=client_id).delete()
+        RefreshToken.query.filter_by(client_id=client_id).delete()
+        ClientDataBlobStore.release(ClientUserData.client_id == client_id)
         ClientUserData.query.filter_by(client_id=client_id).delete()
+        ClientDataFeed.purge_client(client_id)
+        ClientDataQuota.purge(client_id=client_id)
 
         db.session.delete(client)
         db.session.commit()
+        token_cache.invalidate_where(client_id=client_id)
+        revocation_list.invalidate()
+        client_registry.remove(client_id)
 
         return jsonify({
             'success': True,
@@ -2614,6 +5127,43 @@ def admin_delete_client(client_id):
             'error': f'删除应用失败: {str(e)}'
         }), 500
 
+@app.route('/api/admin/token_cache')
+@admin_required
+def admin_token_cache_stats():
+    """访问令牌缓存统计"""
+    return jsonify(token_cache.stats())
+
+
+@app.route('/api/admin/token_cache', methods=['DELETE'])
+@admin_required
+def admin_clear_token_cache():
+    """清空访问令牌缓存"""
+    token_cache.clear()
+    return jsonify({'success': True, 'message': '令牌缓存已清空'})
+
+@app.route('/api/admin/client_data_storage')
+@admin_required
+def admin_client_data_storage_stats():
+    """第三方存储数据的存储字节数与原始字节数之比（可按client_id过滤）"""
+    return jsonify(ClientDataCodec.storage_stats(request.args.get('client_id')))
+
+
+@app.route('/api/admin/sweeper')
+@admin_required
+def admin_sweeper_stats():
+    """过期数据清理进度和上次运行统计"""
+    return jsonify(sweeper.stats())
+
+
+@app.route('/api/admin/sweeper/run', methods=['POST'])
+@admin_required
+def admin_run_sweeper():
+    """立即执行一轮过期数据清理"""
+    result = sweeper.run_once()
+    if result is None:
+        return jsonify({'success': False, 'error': '清理正在进行中'}), 409
+    return jsonify({'success': True, 'result': result})
+
 # 配置管理API
 @app.route('/api/admin/configs')
 @admin_required
@@ -2801,9 +5351,138 @@ def get_public_configs():
             'message': str(e)
         }), 500
 
+# 命令行: flask sweep (适合cron定时执行)
+@app.cli.command('sweep')
+@click.option('--batch-size', type=int, default=None, help='每批删除的最大行数')
+@click.option('--loop', 'loop_interval', type=int, default=0, help='大于0时按该间隔秒数循环执行')
+def sweep_command(batch_size, loop_interval):
+    """清理过期的令牌、授权码和验证码"""
+    if batch_size:
+        sweeper.batch_size = batch_size
+    while True:
+        result = sweeper.run_once()
+        click.echo(json.dumps(result, ensure_ascii=False))
+        if loop_interval <= 0:
+            break
+        time.sleep(loop_interval)
+
+
+# 命令行: flask rebuild-data-usage (全量重新统计第三方存储数据用量, 用于修复计数偏差)
+@app.cli.command('rebuild-data-usage')
+def rebuild_data_usage_command():
+    """按 (client_id, user_id) 重新统计数据条数和字节数"""
+    groups = ClientDataQuota.rebuild()
+    db.session.commit()
+    click.echo(f'已重新统计 {groups} 组用量')
+
+
+# 命令行: flask rebuild-blob-refs (按数据行重新统计去重值块的引用计数, 用于修复计数偏差)
+@app.cli.command('rebuild-blob-refs')
+def rebuild_blob_refs_command():
+    """重新统计值块引用计数，未被引用的值块由清理任务删除"""
+    blobs = ClientDataBlobStore.rebuild()
+    db.session.commit()
+    click.echo(f'已重新统计 {blobs} 个值块的引用计数')
+
+
+# 命令行: flask create-json-index / drop-json-index (为常用的JSON路径条件建立生成列索引)
+@app.cli.command('create-json-index')
+@click.argument('path')
+@click.option('--type', 'kind', type=click.Choice(ClientDataJSONQuery.INDEX_KINDS), default='string',
+              help='比较值的类型（字符串或数字条件分别使用对应类型的索引）')
+def create_json_index_command(path, kind):
+    """为JSON路径（如 $.theme）创建生成列和索引"""
+    if not ClientDataJSONQuery.PATH_PATTERN.match(path):
+        raise click.ClickException(f'无效的JSON路径: {path}')
+    column_name = ClientDataJSONQuery.create_index(path, kind)
+    click.echo(f'已创建 {path} ({kind}) 的生成列 {column_name} 及索引，重启应用后生效')
+
+
+@app.cli.command('drop-json-index')
+@click.argument('path')
+@click.option('--type', 'kind', type=click.Choice(ClientDataJSONQuery.INDEX_KINDS), default='string')
+def drop_json_index_command(path, kind):
+    """删除JSON路径的生成列和索引"""
+    if not ClientDataJSONQuery.PATH_PATTERN.match(path):
+        raise click.ClickException(f'无效的JSON路径: {path}')
+    if ClientDataJSONQuery.drop_index(path, kind):
+        click.echo(f'已删除 {path} ({kind}) 的生成列及索引')
+    else:
+        click.echo(f'{path} ({kind}) 没有生成列索引')
+
+def hot_queries():
+    """热点查询的形状 (名称, 查询)，用于检查执行计划"""
+    now = get_utc_now()
+    client_ids = ['client_a', 'client_b']
+    return [
+        ('token_lookup', AccessToken.query.filter_by(token='0' * 64)),
+        ('authorized_apps_codes', AuthorizationCode.query.filter_by(user_id=1)),
+        ('authorized_apps_tokens', AccessToken.query.filter_by(user_id=1)),
+        ('authorized_apps_active_token', AccessToken.query.filter(
+            AccessToken.user_id == 1, AccessToken.client_id == 'client_a', AccessToken.expires_at > now)),
+        ('authorized_apps_latest_code', AuthorizationCode.query.filter_by(
+            user_id=1, client_id='client_a').order_by(AuthorizationCode.expires_at.desc())),
+        ('revoke_authorization', AccessToken.query.filter_by(user_id=1, client_id='client_a')),
+        ('stats_authorized_users', db.session.query(DatabaseCompat.distinct(AuthorizationCode.user_id)).filter(
+            AuthorizationCode.client_id.in_(client_ids))),
+        ('stats_monthly_authorizations', db.session.query(DatabaseCompat.distinct(AuthorizationCode.user_id)).filter(
+            AuthorizationCode.client_id.in_(client_ids), AuthorizationCode.expires_at >= now)),
+        ('stats_my_apps', OAuthClient.query.filter_by(user_id=1)),
+        ('admin_client_auth_count', AuthorizationCode.query.filter_by(client_id='client_a')),
+        ('admin_monthly_authorizations', AuthorizationCode.query.filter(AuthorizationCode.expires_at >= now)),
+        ('admin_authorizations', AuthorizationCode.query.order_by(AuthorizationCode.expires_at.desc()).limit(10)),
+        ('delete_client_tokens', AccessToken.query.filter_by(client_id='client_a')),
+        ('client_data_by_client', ClientUserData.query.filter_by(client_id='client_a')),
+        ('client_data_by_user', ClientUserData.query.filter_by(user_id=1)),
+        ('client_data_usage', ClientDataUsage.query.filter(ClientDataUsage.client_id == 'client_a',
+                                                           ClientDataUsage.user_id.in_([0, 1]))),
+        ('client_data_json_query', ClientUserData.query.filter(
+            ClientUserData.client_id == 'client_a', ClientUserData.data_key == 'profile',
+            ClientUserData.data_codec == 'json', ClientDataJSONQuery.condition({'path': '$.theme', 'op': 'eq',
+                                                                                'value': 'dark'}))),
+        ('sweep_client_data', ClientUserData.query.filter(ClientUserData.expires_at < now)),
+        ('sweep_client_data_blobs', ClientDataBlob.query.filter(ClientDataBlob.ref_count <= 0)),
+        ('client_data_blob_refs', db.session.query(func.count(ClientUserData.id)).filter(
+            ClientUserData.blob_id == 1)),
+        ('client_data_changes', ClientDataChange.query.filter(ClientDataChange.client_id == 'client_a',
+                                                               ClientDataChange.id > 0).order_by(ClientDataChange.id)),
+        ('verify_email_code', EmailVerificationCode.query.filter(
+            EmailVerificationCode.email == 'a@b.c', EmailVerificationCode.code == '000000',
+            EmailVerificationCode.expires_at > now, EmailVerificationCode.used == False)),
+        ('refresh_token_revoke', RefreshToken.query.filter_by(user_id=1, client_id='client_a')),
+        ('sweep_access_tokens', AccessToken.query.filter(AccessToken.expires_at < now)),
+        ('sweep_refresh_tokens', RefreshToken.query.filter(RefreshToken.expires_at < now)),
+    ]
+
+
+# 命令行: flask check-indexes (检查热点查询是否有全表扫描, 仅支持SQLite)
+@app.cli.command('check-indexes')
+def check_indexes_command():
+    """用 EXPLAIN QUERY PLAN 检查热点查询均使用索引"""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('仅支持SQLite数据库')
+
+    full_scans = []
+    for name, query in hot_queries():
+        sql = str(query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+        plan = [row[3] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}'))]
+        # "SCAN <表>" 不带 "USING ... INDEX" 即为全表扫描
+        scans = [detail for detail in plan if detail.startswith('SCAN') and 'INDEX' not in detail]
+        click.echo(f"{'FAIL' if scans else 'OK  '} {name}: {'; '.join(plan)}")
+        if scans:
+            full_scans.append(name)
+
+    if full_scans:
+        raise click.ClickException(f"以下查询存在全表扫描: {', '.join(full_scans)}")
+
 # 加载插件
 for _plugin in plugin_manager.call_plugin_method("InitRoute", globals()):
     _plugin.init_route()
 
+# 间隔由配置 sweeper_interval 控制, 为0时不启动
+if RUN_SWEEPER and os.getenv('FLASK_RUN_FROM_CLI') != 'true':
+    sweeper.start()
+
 if __name__ == '__main__':
+    sweeper.start()
     app.run(debug=False, port=12345, host='::')
\ No newline at end of file
@@ -0,0 +1,25 @@
+"""baseline: schema created by db.create_all()
+
+Revision ID: 0001_baseline
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 表结构由 main.py 中的 db.create_all() 创建, 此版本仅作为迁移起点
+    pass
+
+
+def downgrade():
+    pass
@@ -0,0 +1,81 @@
+"""store access tokens and authorization codes as SHA-256 digests
+
+Revision ID: 0002_token_digests
+Revises: 0001_baseline
+Create Date: 2026-10-18 10:10:00.000000
+
+"""
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_token_digests'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def hash_column(table, column):
+    """将明文列分批替换为SHA-256摘要; 已是64位摘要的行(签名令牌)保持不变"""
+    bind = op.get_bind()
+    tbl = sa.table(table, sa.column('id', sa.Integer), sa.column(column, sa.String))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(tbl.c.id, tbl.c[column])
+            .where(tbl.c.id > last_id, sa.func.length(tbl.c[column]) != 64)
+            .order_by(tbl.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+
+        for row_id, value in rows:
+            bind.execute(
+                tbl.update().where(tbl.c.id == row_id)
+                .values({column: hashlib.sha256(value.encode('utf-8')).hexdigest()})
+            )
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    access_token_columns = {column['name'] for column in inspector.get_columns('access_token')}
+
+    if 'is_signed' not in access_token_columns:
+        with op.batch_alter_table('access_token') as batch_op:
+            batch_op.add_column(sa.Column('is_signed', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+        # 此前签名令牌已经以64位摘要保存, 随机令牌固定为54位
+        access_token = sa.table('access_token', sa.column('token', sa.String), sa.column('is_signed', sa.Boolean))
+        op.execute(access_token.update().where(sa.func.length(access_token.c.token) == 64).values(is_signed=True))
+
+    hash_column('access_token', 'token')
+    hash_column('authorization_code', 'code')
+
+    with op.batch_alter_table('access_token') as batch_op:
+        batch_op.alter_column('token', existing_type=sa.String(500), type_=sa.CHAR(64), existing_nullable=False)
+    with op.batch_alter_table('authorization_code') as batch_op:
+        batch_op.alter_column('code', existing_type=sa.String(500), type_=sa.CHAR(64), existing_nullable=False)
+    for table in ('refresh_token', 'revoked_token'):
+        if inspector.has_table(table):
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.alter_column('token_hash', existing_type=sa.String(64), type_=sa.CHAR(64),
+                                      existing_nullable=False)
+
+
+def downgrade():
+    # 摘要无法还原为明文: 降级后已签发的令牌和授权码全部失效
+    op.execute('DELETE FROM access_token')
+    op.execute('DELETE FROM authorization_code')
+
+    with op.batch_alter_table('access_token') as batch_op:
+        batch_op.alter_column('token', existing_type=sa.CHAR(64), type_=sa.String(500), existing_nullable=False)
+        batch_op.drop_column('is_signed')
+    with op.batch_alter_table('authorization_code') as batch_op:
+        batch_op.alter_column('code', existing_type=sa.CHAR(64), type_=sa.String(500), existing_nullable=False)
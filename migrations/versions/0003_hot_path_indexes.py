@@ -0,0 +1,54 @@
+"""composite indexes for hot query shapes
+
+Revision ID: 0003_hot_path_indexes
+Revises: 0002_token_digests
+Create Date: 2026-10-18 10:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_hot_path_indexes'
+down_revision = '0002_token_digests'
+branch_labels = None
+depends_on = None
+
+# (索引名, 表名, 列)
+INDEXES = [
+    ('ix_email_verification_code_lookup', 'email_verification_code', ['email', 'code', 'used', 'expires_at']),
+    ('ix_client_user_data_user_client', 'client_user_data', ['user_id', 'client_id']),
+    ('ix_oauth_client_user_id', 'o_auth_client', ['user_id']),
+    ('ix_authorization_code_client_user', 'authorization_code', ['client_id', 'user_id']),
+    ('ix_authorization_code_user_client_expires', 'authorization_code', ['user_id', 'client_id', 'expires_at']),
+    ('ix_authorization_code_expires_at', 'authorization_code', ['expires_at']),
+    ('ix_access_token_user_client_expires', 'access_token', ['user_id', 'client_id', 'expires_at']),
+    ('ix_access_token_client_id', 'access_token', ['client_id']),
+    ('ix_access_token_expires_at', 'access_token', ['expires_at']),
+    ('ix_refresh_token_user_client', 'refresh_token', ['user_id', 'client_id']),
+    ('ix_refresh_token_client_id', 'refresh_token', ['client_id']),
+    ('ix_refresh_token_expires_at', 'refresh_token', ['expires_at']),
+]
+
+
+def existing_indexes(inspector, table):
+    if not inspector.has_table(table):
+        return None
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        indexes = existing_indexes(inspector, table)
+        if indexes is not None and name not in indexes:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in reversed(INDEXES):
+        indexes = existing_indexes(inspector, table)
+        if indexes is not None and name in indexes:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,33 @@
+"""access token grant type for client_credentials tokens
+
+Revision ID: 0004_client_credentials
+Revises: 0003_hot_path_indexes
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_client_credentials'
+down_revision = '0003_hot_path_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('access_token')}
+    if 'grant_type' not in columns:
+        with op.batch_alter_table('access_token') as batch_op:
+            batch_op.add_column(sa.Column('grant_type', sa.String(length=20), nullable=False,
+                                          server_default='authorization_code'))
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('access_token')}
+    if 'grant_type' in columns:
+        with op.batch_alter_table('access_token') as batch_op:
+            batch_op.drop_column('grant_type')
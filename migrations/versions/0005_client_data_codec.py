@@ -0,0 +1,42 @@
+"""client data codec columns for transparent zlib compression
+
+Revision ID: 0005_client_data_codec
+Revises: 0004_client_credentials
+Create Date: 2026-10-18 10:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_client_data_codec'
+down_revision = '0004_client_credentials'
+branch_labels = None
+depends_on = None
+
+# 已有数据保持 data_codec 为空（旧数据），读取时按原方式解析
+COLUMNS = [
+    ('data_codec', lambda: sa.String(length=10)),
+    ('data_compressed', lambda: sa.LargeBinary().with_variant(mysql.LONGBLOB(), 'mysql')),
+    ('data_size', lambda: sa.Integer()),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing = {column['name'] for column in inspector.get_columns('client_user_data')}
+    with op.batch_alter_table('client_user_data') as batch_op:
+        for name, column_type in COLUMNS:
+            if name not in existing:
+                batch_op.add_column(sa.Column(name, column_type(), nullable=True))
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing = {column['name'] for column in inspector.get_columns('client_user_data')}
+    with op.batch_alter_table('client_user_data') as batch_op:
+        for name, _ in reversed(COLUMNS):
+            if name in existing:
+                batch_op.drop_column(name)
@@ -0,0 +1,32 @@
+"""client data version column for optimistic concurrency
+
+Revision ID: 0006_client_data_version
+Revises: 0005_client_data_codec
+Create Date: 2026-10-18 10:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_client_data_version'
+down_revision = '0005_client_data_codec'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('client_user_data')}
+    if 'version' not in columns:
+        with op.batch_alter_table('client_user_data') as batch_op:
+            batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('client_user_data')}
+    if 'version' in columns:
+        with op.batch_alter_table('client_user_data') as batch_op:
+            batch_op.drop_column('version')
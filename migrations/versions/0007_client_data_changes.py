@@ -0,0 +1,41 @@
+"""client data change feed table
+
+Revision ID: 0007_client_data_changes
+Revises: 0006_client_data_version
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_client_data_changes'
+down_revision = '0006_client_data_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table('client_data_change'):
+        return
+
+    op.create_table(
+        'client_data_change',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('client_id', sa.String(length=40), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('data_key', sa.String(length=200), nullable=False),
+        sa.Column('op', sa.String(length=10), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sqlite_autoincrement=True,
+    )
+    op.create_index('ix_client_data_change_client_seq', 'client_data_change', ['client_id', 'id'])
+    op.create_index('ix_client_data_change_created_at', 'client_data_change', ['created_at'])
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table('client_data_change'):
+        op.drop_table('client_data_change')
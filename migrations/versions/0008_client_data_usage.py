@@ -0,0 +1,67 @@
+"""client data usage counters per client and per (client, user)
+
+Revision ID: 0008_client_data_usage
+Revises: 0007_client_data_changes
+Create Date: 2026-10-18 11:10:00.000000
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_client_data_usage'
+down_revision = '0007_client_data_changes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table('client_data_usage'):
+        op.create_table(
+            'client_data_usage',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('client_id', sa.String(length=40), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('row_count', sa.BigInteger(), nullable=False),
+            sa.Column('byte_count', sa.BigInteger(), nullable=False),
+            sa.Column('updated_at', sa.DateTime()),
+            sa.UniqueConstraint('client_id', 'user_id', name='_client_data_usage_uc'),
+        )
+
+    # 表可能已由应用启动时的create_all创建, 计数为空时按已有数据统计一次
+    usage = sa.table('client_data_usage', sa.column('client_id'), sa.column('user_id'),
+                     sa.column('row_count'), sa.column('byte_count'), sa.column('updated_at'))
+    if bind.execute(sa.select(sa.func.count()).select_from(usage)).scalar():
+        return
+
+    data = sa.table('client_user_data', sa.column('id'), sa.column('client_id'), sa.column('user_id'),
+                    sa.column('data_value'), sa.column('data_size'))
+    size = sa.func.coalesce(data.c.data_size, sa.func.length(data.c.data_value), 0)
+    groups = bind.execute(
+        sa.select(data.c.client_id, data.c.user_id, sa.func.count(data.c.id), sa.func.sum(size))
+        .group_by(data.c.client_id, data.c.user_id)
+    ).fetchall()
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    totals = {}
+    rows = []
+    for client_id, user_id, count, total in groups:
+        rows.append({'client_id': client_id, 'user_id': user_id, 'row_count': count,
+                     'byte_count': int(total or 0), 'updated_at': now})
+        client_rows, client_bytes = totals.get(client_id, (0, 0))
+        totals[client_id] = (client_rows + count, client_bytes + int(total or 0))
+    rows.extend({'client_id': client_id, 'user_id': 0, 'row_count': count, 'byte_count': total,
+                 'updated_at': now} for client_id, (count, total) in totals.items())
+    if rows:
+        op.bulk_insert(usage, rows)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table('client_data_usage'):
+        op.drop_table('client_data_usage')
@@ -0,0 +1,50 @@
+"""client data values as native JSON (MySQL JSON column, SQLite JSON1)
+
+Revision ID: 0009_client_data_json
+Revises: 0008_client_data_usage
+Create Date: 2026-10-18 11:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_client_data_json'
+down_revision = '0008_client_data_usage'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    # 用量计数按 data_size（为空时按存储长度）统计, 先固定旧数据的大小以免转换后计数偏差
+    op.execute(
+        "UPDATE client_user_data SET data_size = length(data_value) "
+        "WHERE data_codec IS NULL AND data_size IS NULL AND data_value IS NOT NULL"
+    )
+
+    # 旧数据(data_codec为空)可能是纯文本: 非JSON的值转为JSON字符串, 之后所有未压缩的值都是合法JSON
+    # 读取结果不变（旧数据本就按字符串返回），JSON函数也不会因格式错误而报错
+    op.execute(
+        "UPDATE client_user_data SET data_value = json_quote(data_value) "
+        "WHERE data_codec IS NULL AND data_value IS NOT NULL AND json_valid(data_value) = 0"
+    )
+    op.execute(
+        "UPDATE client_user_data SET data_codec = 'json' "
+        "WHERE data_codec IS NULL"
+    )
+
+    # SQLite的JSON1函数直接作用于TEXT列, 只有MySQL需要修改列类型
+    if bind.dialect.name == 'mysql':
+        column = next(column for column in sa.inspect(bind).get_columns('client_user_data')
+                      if column['name'] == 'data_value')
+        if column['type'].__class__.__name__ != 'JSON':
+            op.execute('ALTER TABLE client_user_data MODIFY data_value JSON NULL')
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'mysql':
+        op.execute('ALTER TABLE client_user_data MODIFY data_value LONGTEXT NULL')
@@ -0,0 +1,39 @@
+"""client data expiry (ttl) column
+
+Revision ID: 0010_client_data_ttl
+Revises: 0009_client_data_json
+Create Date: 2026-10-18 11:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010_client_data_ttl'
+down_revision = '0009_client_data_json'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {column['name'] for column in inspector.get_columns('client_user_data')}
+    # 可空列直接ADD COLUMN, 不重建表（保留create-json-index添加的生成列）
+    if 'expires_at' not in columns:
+        op.add_column('client_user_data', sa.Column('expires_at', sa.DateTime(), nullable=True))
+
+    indexes = {index['name'] for index in inspector.get_indexes('client_user_data')}
+    if 'ix_client_user_data_expires_at' not in indexes:
+        op.create_index('ix_client_user_data_expires_at', 'client_user_data', ['expires_at'])
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    indexes = {index['name'] for index in inspector.get_indexes('client_user_data')}
+    if 'ix_client_user_data_expires_at' in indexes:
+        op.drop_index('ix_client_user_data_expires_at', table_name='client_user_data')
+
+    columns = {column['name'] for column in inspector.get_columns('client_user_data')}
+    if 'expires_at' in columns:
+        op.drop_column('client_user_data', 'expires_at')
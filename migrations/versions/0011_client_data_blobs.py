@@ -0,0 +1,66 @@
+"""content-addressed value blobs for client data deduplication
+
+Revision ID: 0011_client_data_blobs
+Revises: 0010_client_data_ttl
+Create Date: 2026-10-18 11:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = '0011_client_data_blobs'
+down_revision = '0010_client_data_ttl'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('client_data_blob'):
+        op.create_table(
+            'client_data_blob',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('digest', sa.CHAR(length=64), nullable=False, unique=True),
+            sa.Column('data_codec', sa.String(length=10), nullable=False),
+            sa.Column('data_value', sa.Text().with_variant(mysql.JSON(), 'mysql')),
+            sa.Column('data_compressed', sa.LargeBinary().with_variant(mysql.LONGBLOB(), 'mysql')),
+            sa.Column('data_size', sa.Integer(), nullable=False),
+            sa.Column('ref_count', sa.BigInteger(), nullable=False),
+            sa.Column('created_at', sa.DateTime()),
+        )
+        op.create_index('ix_client_data_blob_ref_count', 'client_data_blob', ['ref_count'])
+
+    # 可空列直接ADD COLUMN, 不重建表（保留create-json-index添加的生成列）
+    columns = {column['name'] for column in inspector.get_columns('client_user_data')}
+    if 'blob_id' not in columns:
+        op.add_column('client_user_data', sa.Column('blob_id', sa.Integer(), nullable=True))
+
+    indexes = {index['name'] for index in inspector.get_indexes('client_user_data')}
+    if 'ix_client_user_data_blob_id' not in indexes:
+        op.create_index('ix_client_user_data_blob_id', 'client_user_data', ['blob_id'])
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    indexes = {index['name'] for index in inspector.get_indexes('client_user_data')}
+    if 'ix_client_user_data_blob_id' in indexes:
+        op.drop_index('ix_client_user_data_blob_id', table_name='client_user_data')
+
+    columns = {column['name'] for column in inspector.get_columns('client_user_data')}
+    if 'blob_id' in columns:
+        # 先将去重存储的值写回数据行
+        op.execute(
+            "UPDATE client_user_data SET "
+            "data_codec = (SELECT data_codec FROM client_data_blob WHERE client_data_blob.id = client_user_data.blob_id), "
+            "data_value = (SELECT data_value FROM client_data_blob WHERE client_data_blob.id = client_user_data.blob_id), "
+            "data_compressed = (SELECT data_compressed FROM client_data_blob "
+            "WHERE client_data_blob.id = client_user_data.blob_id) "
+            "WHERE blob_id IS NOT NULL"
+        )
+        op.drop_column('client_user_data', 'blob_id')
+
+    if inspector.has_table('client_data_blob'):
+        op.drop_table('client_data_blob')
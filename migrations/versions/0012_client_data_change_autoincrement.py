@@ -0,0 +1,38 @@
+"""client data change sequence never reuses ids on SQLite
+
+Revision ID: 0012_change_autoincrement
+Revises: 0011_client_data_blobs
+Create Date: 2026-10-18 11:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012_change_autoincrement'
+down_revision = '0011_client_data_blobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    # MySQL的AUTO_INCREMENT不会重用ID; SQLite没有AUTOINCREMENT时会从max(id)+1重新分配
+    if bind.dialect.name != 'sqlite':
+        return
+
+    sql = bind.execute(sa.text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'client_data_change'"
+    )).scalar()
+    if not sql or 'AUTOINCREMENT' in sql.upper():
+        return
+
+    # 重建表，复制已有记录时sqlite_sequence随之更新为当前最大ID
+    with op.batch_alter_table('client_data_change', recreate='always',
+                              table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        pass
+
+
+def downgrade():
+    pass